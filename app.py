@@ -1,25 +1,621 @@
-from flask import Flask, request, jsonify
+import hmac
+import os
+import re
+import secrets
+from datetime import date, datetime
+from functools import wraps
+
+from flask import (Flask, Blueprint, Response, current_app, request, jsonify, render_template, redirect,
+                   url_for, flash, abort, send_file, stream_with_context)
 from flask_cors import CORS
+from flask_login import LoginManager, login_user, logout_user, login_required, current_user
+from alembic.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from flask_migrate import Migrate
+from werkzeug.middleware.proxy_fix import ProxyFix
+from sqlalchemy import event, inspect
 
-app = Flask(__name__)
-CORS(app)  # Allows cross-origin requests from Wix
+from models import db, User, Contact, Task, PopOrder, parse_date
+from ingest import pipeline, validate_order
+from pop_orders import ORDER_STATUSES, bulk_update_status, create_customer_fts, orders_page
+from contacts import contacts_page, contact_json
+from metrics import dashboard_metrics, ensure_rollup
+from contact_import import import_contacts
+from catalog import load_catalog, thumbnail, warm_thumbnails
+import auth
+import backup
+from instrumentation import instrumentation
+from outbox import outbox
+from exports import (ORDER_COLUMNS, CONTACT_COLUMNS, order_export_query, contact_export_query,
+                     csv_chunks, gzip_chunks)
 
-@app.route('/')
-def home():
-    return "✅ Flask backend is running!"
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+LOCAL_SECRET_KEY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'secret_key')
 
-@app.route('/api/pop_order', methods=['POST'])
-def receive_order():
+bp = Blueprint('crm', __name__)
+migrate = Migrate(directory=MIGRATIONS_DIR)
+login_manager = LoginManager()
+login_manager.login_view = 'crm.login'
+
+def database_url():
+    url = os.environ.get('DATABASE_URL', 'sqlite:///crm.db')
+    # Hosted Postgres often hands out the pre-SQLAlchemy-1.4 scheme.
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+def engine_options(url):
+    """Pool settings for the configured backend.
+
+    SQLite gets a pool sized for one connection per request thread (WAL lets
+    them read concurrently) and a busy timeout so writers queue instead of
+    failing.  Postgres gets a pre-pinged psycopg2 pool.
+    """
+    pool_size = int(os.environ.get('DB_POOL_SIZE', 10))
+    max_overflow = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    if url in ('sqlite://', 'sqlite:///:memory:'):
+        return {}
+    if url.startswith('sqlite'):
+        return {
+            'pool_size': pool_size,
+            'max_overflow': max_overflow,
+            'connect_args': {
+                'timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)) / 1000,
+                'check_same_thread': False,
+            },
+        }
+    return {
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_pre_ping': True,
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+    }
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute(f"PRAGMA busy_timeout={int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))}")
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.close()
+
+def stamp_head(connection):
+    """Record the database behind ``connection`` as at the newest migration."""
+    MigrationContext.configure(connection).stamp(ScriptDirectory(MIGRATIONS_DIR), 'head')
+
+def local_secret_key(path=LOCAL_SECRET_KEY_PATH):
+    """Return the key stored at ``path``, generating it on first use.
+
+    Only the single-user launcher (``Launch_CRM`` / ``python app.py``) uses
+    this; servers are given ``SECRET_KEY`` in the environment.
+    """
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    key = secrets.token_hex(32)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        # Another process (the reloader's child) got there first.
+        return local_secret_key(path)
+    with os.fdopen(fd, 'w') as f:
+        f.write(key)
+    return key
+
+def init_schema(app):
+    """Build an empty database from the models; returns True if the schema is current.
+
+    A database with tables is never changed here: it is migrated with
+    ``flask db upgrade``, and until then it is reported as out of date and
+    ``start_background`` refuses to run.
+    """
+    head = ScriptDirectory(MIGRATIONS_DIR).get_current_head()
+    with db.engine.connect() as connection:
+        current = MigrationContext.configure(connection).get_current_revision()
+        tables = inspect(connection).get_table_names()
+    if current is None and not tables:
+        db.create_all()
+        create_customer_fts()
+        with db.engine.begin() as connection:
+            stamp_head(connection)
+        return True
+    if current != head:
+        app.logger.warning("Database schema is at %s, migrations are at %s; run 'flask db upgrade'",
+                           current, head)
+        return False
+    return True
+
+def create_app(config=None):
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY')
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url()
+    app.config['ADMIN_ORDERS_PAGE_SIZE'] = 50
+    app.config['DASHBOARD_CACHE_TTL'] = 60
+    app.config['CONTACTS_PAGE_SIZE'] = 24
+    app.config['IMPORT_REPORT_DIR'] = os.path.join(app.instance_path, 'imports')
+    app.config['IMPORT_REPORT_RETENTION'] = 7 * 24 * 60 * 60
+    app.config['CATALOG_CACHE_TTL'] = 300
+    app.config['THUMBNAIL_DIR'] = os.path.join(app.instance_path, 'thumbnails')
+    app.config['THUMBNAIL_SIZE'] = (640, 320)
+    app.config['PROXY_HOPS'] = int(os.environ.get('PROXY_HOPS', 0))
+    if config:
+        app.config.update(config)
+    if not app.config['SECRET_KEY']:
+        # A published fallback key would let anyone forge a session cookie.
+        if not (app.debug or app.testing):
+            raise RuntimeError('SECRET_KEY is not set; export it before starting the app')
+        app.config['SECRET_KEY'] = 'dev-secret-change-me'
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
+    if app.config['PROXY_HOPS']:
+        # Trust that many X-Forwarded-* hops, so remote_addr (login
+        # throttling) is the client rather than the proxy.
+        hops = app.config['PROXY_HOPS']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops, x_host=hops)
+    CORS(app)  # Allows cross-origin requests from Wix
+
+    db.init_app(app)
+    migrate.init_app(app, db)
+    login_manager.init_app(app)
+    app.register_blueprint(bp)
+
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            event.listen(db.engine, 'connect', _sqlite_pragmas)
+        app.extensions['schema_current'] = init_schema(app)
+        if app.extensions['schema_current']:
+            ensure_rollup()
+    pipeline.init_app(app)
+    backup.init_app(app, db)
+    instrumentation.init_app(app, db)
+    outbox.init_app(app)
+    auth.init_app(app)
+    return app
+
+def start_background(app):
+    """Start the order flusher, outbox workers and snapshot scheduler.
+
+    Only serving processes call this (``wsgi.py`` and the dev server), so
+    ``flask db ...`` and other CLI commands never start worker threads.
+    Refuses to serve a database that ``flask db upgrade`` hasn't brought to
+    the newest migration, since the workers write to the newer tables.
+    """
+    if not app.extensions['schema_current']:
+        raise RuntimeError("Database schema is out of date; run 'flask db upgrade' before starting the app")
+    pipeline.start()
+    outbox.start()
+    backup.start(app)
+
+@login_manager.user_loader
+def load_user(user_id):
+    return auth.user_cache.get(int(user_id))
+
+def admin_required(view):
+    @wraps(view)
+    @login_required
+    def wrapped(*args, **kwargs):
+        if current_user.role != 'admin':
+            abort(403)
+        return view(*args, **kwargs)
+    return wrapped
+
+def scrape_allowed(view):
+    """Allow requests carrying ``METRICS_TOKEN`` as a bearer token, or a signed-in admin."""
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        token = current_app.config['METRICS_TOKEN']
+        if token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return view(*args, **kwargs)
+        if not current_user.is_authenticated:
+            abort(401)
+        if current_user.role != 'admin':
+            abort(403)
+        return view(*args, **kwargs)
+    return wrapped
+
+@bp.route('/')
+@login_required
+def dashboard():
+    metrics, leaderboard = dashboard_metrics(current_app.config['DASHBOARD_CACHE_TTL'])
+    return render_template(
+        'index.html',
+        metrics=metrics,
+        leaderboard=leaderboard,
+        role=current_user.role,
+    )
+
+@bp.route('/api/contacts')
+@login_required
+def api_contacts():
+    limit = max(1, min(request.args.get('limit', current_app.config['CONTACTS_PAGE_SIZE'], type=int), 200))
+    contacts, next_cursor = contacts_page(
+        rep=request.args.get('rep', '').strip(),
+        tag=request.args.get('tag', '').strip(),
+        archived=request.args.get('archived') == '1',
+        after=request.args.get('cursor', type=int),
+        limit=max(limit, 1),
+    )
+    return jsonify({"contacts": [contact_json(c) for c in contacts], "next_cursor": next_cursor})
+
+@bp.route('/contact/<int:contact_id>/update', methods=['POST'])
+@login_required
+def update_contact(contact_id):
+    contact = db.get_or_404(Contact, contact_id)
+    for field in ('name', 'email', 'phone', 'rep', 'tags', 'notes'):
+        if field in request.form:
+            setattr(contact, field, request.form[field].strip())
+    db.session.commit()
+    return redirect(url_for('crm.dashboard'))
+
+@bp.route('/contact/<int:contact_id>/delete')
+@admin_required
+def delete_contact(contact_id):
+    db.session.delete(db.get_or_404(Contact, contact_id))
+    db.session.commit()
+    return redirect(url_for('crm.dashboard'))
+
+@bp.route('/contact/<int:contact_id>/task', methods=['POST'])
+@login_required
+def add_task(contact_id):
+    contact = db.get_or_404(Contact, contact_id)
+    title = request.form.get('title', '').strip()
+    if title:
+        contact.tasks.append(Task(title=title, due_date=parse_date(request.form.get('due_date')), status='pending'))
+        db.session.commit()
+    return redirect(url_for('crm.dashboard'))
+
+@bp.route('/contacts/import', methods=['POST'])
+@admin_required
+def import_contacts_upload():
+    """Bulk-import contacts from an uploaded CSV/JSONL file or a raw request body."""
+    upload = request.files.get('file')
+    if upload is not None:
+        stream, name = upload.stream, upload.filename or ''
+    else:
+        stream, name = request.stream, ''
+    fmt = request.args.get('format') or request.form.get('format')
+    if not fmt:
+        jsonl = name.lower().endswith(('.jsonl', '.ndjson')) or 'ndjson' in (request.content_type or '')
+        fmt = 'jsonl' if jsonl else 'csv'
+    if fmt not in ('csv', 'jsonl'):
+        return jsonify({"success": False, "error": "format must be csv or jsonl"}), 400
+
+    report = import_contacts(stream, fmt, current_app.config['IMPORT_REPORT_DIR'],
+                             report_retention=current_app.config['IMPORT_REPORT_RETENTION'])
+    body = {"success": True, "import_id": report.import_id, **report.counts}
+    if report.has_errors:
+        body['report_url'] = url_for('crm.import_report', import_id=report.import_id)
+    return jsonify(body)
+
+@bp.route('/contacts/import/<import_id>/report')
+@admin_required
+def import_report(import_id):
+    if not re.fullmatch(r'[0-9a-f]{32}', import_id):
+        abort(404)
+    path = os.path.join(current_app.config['IMPORT_REPORT_DIR'], f'{import_id}.csv')
+    if not os.path.exists(path):
+        abort(404)
+    return send_file(path, mimetype='text/csv', as_attachment=True,
+                     download_name=f'contact_import_errors_{import_id}.csv')
+
+@bp.route('/api/tasks')
+@login_required
+def list_tasks():
+    """Pending tasks in one dashboard bucket (overdue, due_today, due_soon)."""
+    bucket = request.args.get('bucket')
+    if bucket not in ('overdue', 'due_today', 'due_soon'):
+        return jsonify({"success": False, "error": "bucket must be overdue, due_today or due_soon"}), 400
+    query = (
+        db.session.query(Task, Contact.name, Contact.rep)
+        .join(Contact, Task.contact_id == Contact.id)
+        .filter(Task.bucket_criteria(bucket, date.today()))
+    )
+    if request.args.get('rep'):
+        query = query.filter(Contact.rep == request.args['rep'])
+    limit = max(1, min(request.args.get('limit', 200, type=int), 200))
+    rows = query.order_by(Task.due_date, Task.id).limit(limit).all()
+    return jsonify([
+        {"id": task.id, "title": task.title, "due_date": task.due_date.isoformat(),
+         "status": task.status, "contact_id": task.contact_id, "contact": name, "rep": rep}
+        for task, name, rep in rows
+    ])
+
+@bp.route('/task/<int:task_id>/status', methods=['POST'])
+@login_required
+def update_task_status(task_id):
+    task = db.get_or_404(Task, task_id)
+    status = request.form.get('status')
+    if status in ('pending', 'completed'):
+        task.status = status
+        db.session.commit()
+    return redirect(url_for('crm.dashboard'))
+
+@bp.route('/login', methods=['GET', 'POST'])
+def login():
+    if request.method == 'POST':
+        username = request.form.get('username', '').strip()
+        retry_after = auth.login_throttle.retry_after(request.remote_addr, username)
+        if retry_after:
+            flash('Too many failed logins. Please try again later.')
+            return render_template('login.html'), 429, {'Retry-After': str(retry_after)}
+        user = User.query.filter_by(username=username).first()
+        try:
+            valid = auth.password_checker.verify(user.password_hash if user else None,
+                                                 request.form.get('password', ''))
+        except auth.PasswordCheckBusy:
+            flash('The server is busy. Please try again in a moment.')
+            return render_template('login.html'), 503, {'Retry-After': '5'}
+        if valid:
+            auth.login_throttle.succeeded(username)
+            login_user(user)
+            next_url = request.args.get('next', '')
+            if not next_url.startswith('/') or next_url.startswith('//'):
+                next_url = url_for('crm.dashboard')
+            return redirect(next_url)
+        auth.login_throttle.failed(request.remote_addr, username)
+        flash('Invalid username or password')
+    return render_template('login.html')
+
+@bp.route('/logout')
+@login_required
+def logout():
+    logout_user()
+    return redirect(url_for('crm.login'))
+
+@bp.route('/admin/pop_orders', methods=['GET', 'POST'])
+@admin_required
+def admin_pop_orders():
+    if request.method == 'POST':
+        order = db.session.get(PopOrder, request.form.get('order_id', type=int))
+        status = request.form.get('status')
+        if order and status in ORDER_STATUSES:
+            order.status = status
+            db.session.commit()
+        return redirect(url_for('crm.admin_pop_orders', **request.args))
+
+    search = request.args.get('search', '').strip()
+    status = request.args.get('status') if request.args.get('status') in ORDER_STATUSES else ''
+    orders, next_cursor = orders_page(
+        search=search,
+        status=status,
+        cursor=request.args.get('cursor'),
+        limit=current_app.config['ADMIN_ORDERS_PAGE_SIZE'],
+    )
+    return render_template(
+        'admin_pop_orders.html',
+        orders=orders,
+        search=search,
+        status=status,
+        statuses=ORDER_STATUSES,
+        next_cursor=next_cursor,
+        paged=bool(request.args.get('cursor')),
+    )
+
+@bp.route('/api/pop_orders/status', methods=['POST'])
+@admin_required
+def bulk_pop_order_status():
+    """Change many orders' status at once.
+
+    Body: ``{"status": "Shipped", "orders": [{"id": 1, "status": "Approved"}, ...]}``
+    (each row's ``status`` is the one the caller saw), or ``"ids": [...]`` with an
+    optional ``"expected_status"``, or ``"filter": {"search", "status", "start", "end"}``.
+    """
+    data = request.get_json(silent=True) or {}
+    new_status = data.get('status')
+    if new_status not in ORDER_STATUSES:
+        return jsonify({"success": False, "error": f"'status' must be one of {', '.join(ORDER_STATUSES)}"}), 400
     try:
-        data = request.get_json()
-        print("✅ Received order data:", data)
+        if 'orders' in data:
+            expected = {int(row['id']): row.get('status') for row in data['orders']}
+        elif 'ids' in data:
+            expected = dict.fromkeys((int(order_id) for order_id in data['ids']), data.get('expected_status'))
+        else:
+            expected = None
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return jsonify({"success": False, "error": "'orders' needs objects with an integer 'id'; 'ids' needs integers"}), 400
+    if expected is not None and any(seen not in ORDER_STATUSES + (None,) for seen in expected.values()):
+        return jsonify({"success": False, "error": "Unknown expected status"}), 400
+
+    if expected is not None:
+        summary = bulk_update_status(new_status, expected=expected)
+    else:
+        criteria = data.get('filter')
+        if not isinstance(criteria, dict):
+            return jsonify({"success": False, "error": "Send 'orders', 'ids' or a 'filter'"}), 400
+        try:
+            start = date.fromisoformat(criteria['start']) if criteria.get('start') else None
+            end = date.fromisoformat(criteria['end']) if criteria.get('end') else None
+        except (TypeError, ValueError):
+            return jsonify({"success": False, "error": "Dates must be YYYY-MM-DD"}), 400
+        status = criteria.get('status') or None
+        if status is not None and status not in ORDER_STATUSES:
+            return jsonify({"success": False, "error": "Unknown filter status"}), 400
+        summary = bulk_update_status(
+            new_status,
+            search=str(criteria.get('search') or '').strip(),
+            status=status,
+            start=start,
+            end=end,
+        )
+    return jsonify(dict(summary, success=True))
+
+def _date_arg(name):
+    try:
+        return datetime.strptime(request.args.get(name, ''), '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+def _csv_response(filename, columns, query):
+    chunks = csv_chunks([label for label, _ in columns], query)
+    mimetype = 'text/csv'
+    if request.args.get('gzip') == '1':
+        chunks = gzip_chunks(chunks)
+        filename += '.gz'
+        mimetype = 'application/gzip'
+    return Response(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'},
+    )
+
+@bp.route('/admin/pop_orders/export')
+@admin_required
+def export_pop_orders_csv():
+    status = request.args.get('status') if request.args.get('status') in ORDER_STATUSES else None
+    query = order_export_query(
+        search=request.args.get('search', '').strip(),
+        status=status,
+        start=_date_arg('start'),
+        end=_date_arg('end'),
+    )
+    return _csv_response(f'pop_orders_{date.today().isoformat()}.csv', ORDER_COLUMNS, query)
+
+@bp.route('/export')
+@admin_required
+def export_contacts_csv():
+    query = contact_export_query(
+        status=request.args.get('status'),
+        start=_date_arg('start'),
+        end=_date_arg('end'),
+    )
+    return _csv_response(f'contacts_{date.today().isoformat()}.csv', CONTACT_COLUMNS, query)
+
+def _catalog():
+    config = current_app.config
+    size = tuple(config['THUMBNAIL_SIZE'])
+    directory, root = config['THUMBNAIL_DIR'], current_app.root_path
+    return load_catalog(
+        config['CATALOG_CACHE_TTL'],
+        size,
+        warm=lambda items: warm_thumbnails(items, directory, size, root),
+    )
 
-        # You could add more logic here (e.g., save to database)
+def _with_validators(response, catalog):
+    response.set_etag(catalog['etag'])
+    response.last_modified = catalog['last_modified']
+    # Let browsers keep the page but check back every time; that's a 304.
+    response.cache_control.no_cache = True
+    return response
 
-        return jsonify({"success": True, "message": "Order received"})
+def _render_pop_items(catalog, error=None, status=200):
+    page = render_template(
+        'pop_items.html',
+        items=catalog['items'],
+        submitted=request.args.get('submitted'),
+        error=error,
+        form=request.form,
+    )
+    return page, status
+
+@bp.route('/pop_items')
+def view_pop_items():
+    catalog = _catalog()
+    if request.if_none_match:
+        fresh = request.if_none_match.contains(catalog['etag'])
+    else:
+        since = request.if_modified_since
+        fresh = bool(since and catalog['last_modified']
+                     and since.replace(tzinfo=None) >= catalog['last_modified'])
+    if fresh:
+        return _with_validators(Response(status=304), catalog)
+    page, status = _render_pop_items(catalog)
+    return _with_validators(Response(page, status), catalog)
+
+@bp.route('/pop_items/<int:item_id>/thumbnail')
+def pop_item_thumbnail(item_id):
+    item = _catalog()['by_id'].get(item_id)
+    if item is None or not item['image_url']:
+        abort(404)
+    config = current_app.config
+    path = thumbnail(item['image_url'], config['THUMBNAIL_DIR'], tuple(config['THUMBNAIL_SIZE']),
+                     current_app.root_path)
+    if path is None:
+        return redirect(item['image_url'])
+    # The page links thumbnails with ?v=<key>, so a matching version never changes.
+    versioned = request.args.get('v') == item['thumb']
+    return send_file(path, mimetype='image/jpeg', max_age=31536000 if versioned else 300)
+
+@bp.route('/pop_items/order', methods=['POST'])
+def submit_pop_order():
+    data = {field: request.form.get(field) or None
+            for field in ('store_name', 'po_number', 'email', 'rep', 'note')}
+    data['items'] = [
+        {'item_id': key, 'quantity': value.strip()}
+        for key, value in request.form.items()
+        if key.isdigit() and value.strip() not in ('', '0')
+    ]
+    try:
+        order = validate_order(data)
+    except ValueError as e:
+        return _render_pop_items(_catalog(), error=str(e), status=400)
+    pipeline.submit(order)
+    return redirect(url_for('crm.view_pop_items', submitted=order['po_number']))
+
+@bp.route('/backup')
+@admin_required
+def backup_download():
+    if db.engine.dialect.name != 'sqlite':
+        return jsonify({"success": False, "error": "Online backup is only available for SQLite; use pg_dump"}), 501
+    chunks = backup.stream_backup(
+        db.engine.url.database,
+        current_app.config['BACKUP_DIR'],
+        pages=current_app.config['BACKUP_PAGES_PER_STEP'],
+        pause=current_app.config['BACKUP_STEP_PAUSE'],
+    )
+    filename = f'crm_{datetime.utcnow().strftime("%Y%m%dT%H%M%S")}.db.gz'
+    return Response(
+        chunks,
+        mimetype='application/gzip',
+        headers={'Content-Disposition': f'attachment; filename={filename}'},
+    )
+
+@bp.route('/backup/stats')
+@admin_required
+def backup_stats():
+    return jsonify(backup.last_backup)
+
+@bp.route('/api/pop_order', methods=['POST'])
+def receive_order():
+    data = request.get_json(silent=True)
+    try:
+        order = validate_order(data)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    try:
+        body, replayed = pipeline.submit(order, request.headers.get('Idempotency-Key'))
     except Exception as e:
-        print("❌ Error receiving order:", str(e))
+        current_app.logger.exception("Could not queue P.O.P. order")
         return jsonify({"success": False, "error": str(e)}), 500
 
+    response = jsonify(body)
+    if replayed:
+        response.headers['Idempotent-Replayed'] = 'true'
+    return response, 202
+
+@bp.route('/api/pop_order/stats')
+@scrape_allowed
+def pop_order_stats():
+    return jsonify(pipeline.stats())
+
+@bp.route('/metrics')
+@scrape_allowed
+def prometheus_metrics():
+    if not instrumentation.enabled:
+        abort(404)
+    gauges = {f'crm_ingest_{name}': value for name, value in pipeline.stats().items()}
+    gauges.update({f'crm_outbox_{name}': value for name, value in outbox.stats().items()})
+    return Response(instrumentation.render(gauges), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
-    app.run(debug=True)
+    debug = os.environ.get('FLASK_DEBUG') == '1'
+    if not os.environ.get('SECRET_KEY'):
+        # Launch_CRM starts the app without any environment; keep sessions
+        # valid across restarts with a key generated once for this install.
+        os.environ['SECRET_KEY'] = local_secret_key()
+    app = create_app({'DEBUG': debug})
+    # With the reloader on, only the child process serves requests.
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background(app)
+    app.run(debug=debug, threaded=True)
@@ -0,0 +1,166 @@
+"""Login helpers: cached session users, bounded password hashing, throttling.
+
+``current_user`` is a read-only ``SessionUser`` snapshot cached per process
+for ``USER_CACHE_TTL`` seconds, so authenticated requests don't query
+``user``.  A role change or removed account applies at once in the worker
+that committed it, and within ``USER_CACHE_TTL`` in every other one.
+
+Password checks run on a small pool of ``LOGIN_HASH_WORKERS`` threads with
+at most ``LOGIN_HASH_QUEUE`` waiting, so a burst of logins can't tie up
+every request thread hashing.  Failed attempts are counted per client IP and
+per username in a sliding window, and further attempts are refused before
+any hashing once either passes its limit.  Counters are per process.  Behind
+a reverse proxy, set ``PROXY_HOPS`` so the client IP is taken from
+``X-Forwarded-For`` rather than every login sharing the proxy's address.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from flask_login import UserMixin
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from models import db, User, invalidate_on_commit
+
+
+class SessionUser(UserMixin):
+    """Read-only snapshot of a ``user`` row, safe to share between threads."""
+
+    def __init__(self, id, username, role):
+        self.id = id
+        self.username = username
+        self.role = role
+
+
+class UserCache:
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[0] > now:
+                return entry[1]
+        row = db.session.get(User, user_id)
+        user = SessionUser(row.id, row.username, row.role) if row is not None else None
+        with self._lock:
+            self._entries[user_id] = (now + self.ttl, user)
+        return user
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class PasswordCheckBusy(Exception):
+    """Raised when the hashing pool is saturated."""
+
+
+class PasswordChecker:
+    def __init__(self, workers=2, queue=32, timeout=10):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-check')
+        self._slots = threading.BoundedSemaphore(workers + queue)
+        self.timeout = timeout
+        # Checked when the username doesn't exist so both paths cost the same.
+        self._dummy_hash = generate_password_hash('not-a-real-password')
+
+    def verify(self, password_hash, password):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordCheckBusy()
+        try:
+            future = self._pool.submit(check_password_hash, password_hash or self._dummy_hash, password)
+        except BaseException:
+            self._slots.release()
+            raise
+        # Free the slot when the hash finishes, not when we stop waiting for it,
+        # so timed-out checks still count against the cap.
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout) and bool(password_hash)
+        except FutureTimeout:
+            raise PasswordCheckBusy()
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
+
+
+class LoginThrottle:
+    """Sliding-window failure counters keyed by IP and by username."""
+
+    def __init__(self, window=300, max_per_ip=20, max_per_user=5, max_keys=10000):
+        self.window = window
+        self.limits = {'ip': max_per_ip, 'user': max_per_user}
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._failures = OrderedDict()
+
+    def _recent(self, key, now):
+        failures = self._failures.get(key)
+        if failures is None:
+            return None
+        while failures and failures[0] <= now - self.window:
+            failures.popleft()
+        if not failures:
+            del self._failures[key]
+            return None
+        return failures
+
+    def retry_after(self, ip, username):
+        """Seconds until another attempt is allowed, or 0 if it is allowed now."""
+        now = time.monotonic()
+        wait = 0
+        with self._lock:
+            for key in (('ip', ip), ('user', username.lower())):
+                failures = self._recent(key, now)
+                if failures is not None and len(failures) >= self.limits[key[0]]:
+                    wait = max(wait, failures[0] + self.window - now)
+        return int(wait) + 1 if wait else 0
+
+    def failed(self, ip, username):
+        now = time.monotonic()
+        with self._lock:
+            for key in (('ip', ip), ('user', username.lower())):
+                failures = self._failures.get(key)
+                if failures is None:
+                    failures = self._failures[key] = deque(maxlen=max(self.limits.values()))
+                failures.append(now)
+                self._failures.move_to_end(key)
+            # Random usernames from a spray attack must not grow this without bound.
+            while len(self._failures) > self.max_keys:
+                self._failures.popitem(last=False)
+
+    def succeeded(self, username):
+        with self._lock:
+            self._failures.pop(('user', username.lower()), None)
+
+
+user_cache = UserCache()
+password_checker = None
+login_throttle = LoginThrottle()
+
+
+def init_app(app):
+    global password_checker
+    app.config.setdefault('USER_CACHE_TTL', 60)
+    app.config.setdefault('LOGIN_HASH_WORKERS', 2)
+    app.config.setdefault('LOGIN_HASH_QUEUE', 32)
+    app.config.setdefault('LOGIN_THROTTLE_WINDOW', 300)
+    app.config.setdefault('LOGIN_MAX_FAILURES_PER_IP', 20)
+    app.config.setdefault('LOGIN_MAX_FAILURES_PER_USER', 5)
+
+    user_cache.ttl = app.config['USER_CACHE_TTL']
+    login_throttle.window = app.config['LOGIN_THROTTLE_WINDOW']
+    login_throttle.limits = {
+        'ip': app.config['LOGIN_MAX_FAILURES_PER_IP'],
+        'user': app.config['LOGIN_MAX_FAILURES_PER_USER'],
+    }
+    if password_checker is not None:
+        password_checker.shutdown()
+    password_checker = PasswordChecker(app.config['LOGIN_HASH_WORKERS'], app.config['LOGIN_HASH_QUEUE'])
+
+
+invalidate_on_commit(User, user_cache.invalidate)
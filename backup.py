@@ -0,0 +1,230 @@
+"""Online SQLite backups that don't block the app.
+
+Copies go through SQLite's online backup API a few hundred pages at a time
+with a short sleep between steps, so request threads keep getting the
+write lock while a large database is copied; if commits from other
+connections keep restarting the copy, it is redone in one step.
+``/backup`` streams a fresh copy gzip-compressed to the client; a
+background thread also keeps rotated snapshots under ``instance/backups``,
+skipping runs when nothing was committed since the previous one
+(``PRAGMA data_version``).
+"""
+import gzip
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from exports import gzip_chunks
+
+try:
+    import fcntl
+except ImportError:  # Windows: the dev launcher runs a single process anyway.
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+last_backup = {}
+_stats_lock = threading.Lock()
+
+
+def _record(kind, started, db_bytes, compressed_bytes, pages):
+    stats = {
+        'kind': kind,
+        'finished_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'seconds': round(time.monotonic() - started, 3),
+        'db_bytes': db_bytes,
+        'compressed_bytes': compressed_bytes,
+        'pages': pages,
+    }
+    with _stats_lock:
+        last_backup[kind] = stats
+    logger.info("SQLite %s backup: %s", kind, stats)
+    return stats
+
+
+class _CopyRestarted(Exception):
+    pass
+
+
+def online_copy(source_path, dest_path, pages=256, pause=0.01, max_restarts=3):
+    """Copy ``source_path`` to ``dest_path`` with the online backup API.
+
+    Returns the total page count.  ``pause`` seconds are slept after every
+    ``pages``-page step so writers aren't starved on a big database.  A
+    commit from another connection restarts a stepped copy from the first
+    page, so under steady writes it could run forever; after
+    ``max_restarts`` restarts the copy is redone in a single step, which
+    holds the read lock for the whole copy but always finishes.
+    """
+    state = {'page_count': 0, 'remaining': None, 'restarts': 0}
+
+    def progress(status, remaining, page_count):
+        state['page_count'] = page_count
+        if state['remaining'] is not None and remaining > state['remaining']:
+            state['restarts'] += 1
+            if state['restarts'] > max_restarts:
+                raise _CopyRestarted()
+        state['remaining'] = remaining
+        if remaining:
+            time.sleep(pause)
+
+    source = sqlite3.connect(source_path)
+    dest = sqlite3.connect(dest_path)
+    try:
+        try:
+            source.backup(dest, pages=pages, progress=progress)
+        except _CopyRestarted:
+            logger.info("Online copy of %s restarted %d times under writes; copying in one step",
+                        source_path, state['restarts'])
+            state['remaining'] = None
+            source.backup(dest, pages=-1, progress=progress)
+    finally:
+        dest.close()
+        source.close()
+    return state['page_count']
+
+
+def _file_chunks(path, chunk_size):
+    with open(path, 'rb') as raw:
+        while True:
+            block = raw.read(chunk_size)
+            if not block:
+                return
+            yield block
+
+
+def stream_backup(source_path, workdir, pages=256, pause=0.01, chunk_size=64 * 1024):
+    """Take an online copy, then yield it gzip-compressed in chunks.
+
+    The copy finishes before the first byte is sent, so a slow download
+    never holds SQLite locks.  The temporary copy is removed afterwards.
+    """
+    os.makedirs(workdir, exist_ok=True)
+    fd, copy_path = tempfile.mkstemp(suffix='.db', dir=workdir)
+    os.close(fd)
+    started = time.monotonic()
+    try:
+        page_count = online_copy(source_path, copy_path, pages, pause)
+        db_bytes = os.path.getsize(copy_path)
+        compressed = 0
+        for data in gzip_chunks(_file_chunks(copy_path, chunk_size)):
+            compressed += len(data)
+            yield data
+        _record('download', started, db_bytes, compressed, page_count)
+    finally:
+        os.remove(copy_path)
+
+
+class SnapshotScheduler:
+    """Periodic compressed snapshots with rotation, one process at a time."""
+
+    def __init__(self, source_path, directory, interval, retention, pages=256, pause=0.01):
+        self.source_path = source_path
+        self.directory = directory
+        self.interval = interval
+        self.retention = retention
+        self.pages = pages
+        self.pause = pause
+        self._stopping = threading.Event()
+        self._last_version = None
+        self._lock_file = None
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        if not self._acquire_lock():
+            return False
+        thread = threading.Thread(target=self._run, name='sqlite-snapshots', daemon=True)
+        thread.start()
+        return True
+
+    def stop(self):
+        self._stopping.set()
+
+    def _acquire_lock(self):
+        if fcntl is None:
+            return True
+        self._lock_file = open(os.path.join(self.directory, '.scheduler.lock'), 'w')
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._lock_file.close()
+            self._lock_file = None
+            return False
+        return True
+
+    def _run(self):
+        # A dedicated connection: data_version changes whenever any other
+        # connection commits, which is how unchanged databases are skipped.
+        watcher = sqlite3.connect(self.source_path, check_same_thread=False)
+        try:
+            while not self._stopping.wait(self.interval):
+                try:
+                    version = watcher.execute('PRAGMA data_version').fetchone()[0]
+                    if version == self._last_version:
+                        continue
+                    self.snapshot()
+                    self._last_version = version
+                except Exception:
+                    logger.exception("SQLite snapshot failed")
+        finally:
+            watcher.close()
+
+    def snapshot(self):
+        started = time.monotonic()
+        stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S')
+        copy_path = os.path.join(self.directory, f'.crm-{stamp}.db')
+        final_path = os.path.join(self.directory, f'crm-{stamp}.db.gz')
+        try:
+            page_count = online_copy(self.source_path, copy_path, self.pages, self.pause)
+            db_bytes = os.path.getsize(copy_path)
+            with open(copy_path, 'rb') as raw, gzip.open(final_path + '.part', 'wb') as gz:
+                shutil.copyfileobj(raw, gz, 1024 * 1024)
+            os.replace(final_path + '.part', final_path)
+        finally:
+            if os.path.exists(copy_path):
+                os.remove(copy_path)
+        self._rotate()
+        return _record('snapshot', started, db_bytes, os.path.getsize(final_path), page_count)
+
+    def _rotate(self):
+        snapshots = sorted(
+            name for name in os.listdir(self.directory)
+            if name.startswith('crm-') and name.endswith('.db.gz')
+        )
+        for name in snapshots[:-self.retention] if self.retention else []:
+            os.remove(os.path.join(self.directory, name))
+
+
+def init_app(app, db):
+    app.config.setdefault('BACKUP_DIR', os.path.join(app.instance_path, 'backups'))
+    app.config.setdefault('BACKUP_PAGES_PER_STEP', 256)
+    app.config.setdefault('BACKUP_STEP_PAUSE', 0.01)
+    app.config.setdefault('BACKUP_INTERVAL', 6 * 60 * 60)
+    app.config.setdefault('BACKUP_RETENTION', 14)
+
+    with app.app_context():
+        if db.engine.dialect.name != 'sqlite' or not db.engine.url.database:
+            return
+        app.extensions['backup_source'] = db.engine.url.database
+
+
+def start(app):
+    """Start the snapshot scheduler if ``BACKUP_INTERVAL`` is set and the DB is a SQLite file."""
+    source_path = app.extensions.get('backup_source')
+    if not source_path or not app.config['BACKUP_INTERVAL'] or 'backup_scheduler' in app.extensions:
+        return
+    scheduler = SnapshotScheduler(
+        source_path,
+        app.config['BACKUP_DIR'],
+        app.config['BACKUP_INTERVAL'],
+        app.config['BACKUP_RETENTION'],
+        app.config['BACKUP_PAGES_PER_STEP'],
+        app.config['BACKUP_STEP_PAUSE'],
+    )
+    if scheduler.start():
+        app.extensions['backup_scheduler'] = scheduler
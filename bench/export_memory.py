@@ -0,0 +1,62 @@
+"""Show that the CSV exports stream in bounded memory.
+
+Builds a synthetic SQLite database with ``--rows`` P.O.P. orders and
+contacts, then downloads both exports through the Flask test client while
+tracking peak Python heap usage with tracemalloc.  Peak memory should stay
+roughly the same whether the tables hold 10k or a million rows.
+
+    python bench/export_memory.py --rows 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from generate_data import build_database
+
+
+def measure(client, url):
+    tracemalloc.start()
+    started = time.perf_counter()
+    response = client.get(url, buffered=False)
+    size = 0
+    for chunk in response.response:
+        size += len(chunk)
+    response.close()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return response.status_code, size, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='crm-export-bench-')
+    db_path = os.path.join(workdir, 'crm.db')
+    print(f'Building {args.rows:,} orders and contacts in {db_path} ...')
+    build_database(db_path, args.rows, orders=args.rows, tasks=0, notes=0)
+
+    from app import create_app
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+        'INGEST_QUEUE_PATH': os.path.join(workdir, 'queue.db'),
+        'INGEST_BACKGROUND_FLUSH': False,
+        'OUTBOX_WORKERS': 0,
+        'BACKUP_INTERVAL': 0,
+        'SECRET_KEY': 'bench',
+    })
+    client = app.test_client()
+    client.post('/login', data={'username': 'bench', 'password': 'bench'})
+    for url in ('/admin/pop_orders/export', '/admin/pop_orders/export?gzip=1', '/export'):
+        status, size, elapsed, peak = measure(client, url)
+        print(f'{url:36} status={status} bytes={size:,} seconds={elapsed:.2f} '
+              f'rows/s={args.rows / elapsed:,.0f} peak_heap={peak / 1024 / 1024:.1f} MiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,281 @@
+"""Generate a synthetic CRM database at a chosen scale.
+
+Fills ``contact``, ``task``, ``note``, ``customer``, ``pop_item`` and
+``pop_order`` with seeded, repeatable data shaped like production:
+
+* a couple of dozen reps with a long-tailed share of contacts and customers;
+* contacts created over two years, more of them recently;
+* task due dates clustered around today, mostly completed once past due;
+* orders concentrated on a minority of customers and popular items, on
+  weekdays, with older orders further along (Shipped/Rejected) than new ones.
+
+Table sizes scale from ``--contacts``; the other tables default to fixed
+ratios of it and can be set explicitly.  The schema comes from the models
+(plus the ``customer_fts`` search table where SQLite has FTS5), the
+dashboard rollup is rebuilt at the end, and the file is stamped at the
+newest migration.
+
+    python bench/generate_data.py --contacts 100000 --out /tmp/crm-bench.db
+
+Every generated user, ``bench`` (admin) and one per rep, has the password
+``bench``.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, time as dt_time, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from flask import Flask  # noqa: E402
+from sqlalchemy import insert, text  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+from models import db, User, Contact, Task, Note, Customer, PopItem, PopOrder  # noqa: E402
+from app import stamp_head  # noqa: E402
+from metrics import rebuild  # noqa: E402
+from pop_orders import create_customer_fts  # noqa: E402
+
+CHUNK_ROWS = 20000
+
+REPS = (
+    'Polina', 'Marcus', 'Aisha', 'Diego', 'Hannah', 'Kenji', 'Fatima', 'Owen',
+    'Lucia', 'Tariq', 'Greta', 'Samuel', 'Mei', 'Andre', 'Ingrid', 'Jonah',
+    'Priya', 'Mateo', 'Chloe', 'Ravi', 'Nadia', 'Elliot', 'Sofia', 'Bruno',
+)
+FIRST_NAMES = (
+    'James', 'Maria', 'Wei', 'Olivia', 'Ahmed', 'Emma', 'Carlos', 'Yuki', 'Liam', 'Zara',
+    'Noah', 'Amara', 'Lucas', 'Elena', 'Omar', 'Grace', 'Ivan', 'Leila', 'Ethan', 'Rosa',
+)
+LAST_NAMES = (
+    'Smith', 'Garcia', 'Chen', 'Johnson', 'Khan', 'Brown', 'Silva', 'Tanaka', 'Miller', 'Okafor',
+    'Davis', 'Rossi', 'Nguyen', 'Wilson', 'Haddad', 'Moore', 'Petrov', 'Lopez', 'Taylor', 'Schmidt',
+)
+DOMAINS = ('example.com', 'example.net', 'shop.example', 'retail.example')
+TAGS = ('retail', 'wholesale', 'vip', 'expo', 'lead', 'dispensary', 'online', 'chain', 'new')
+CHAINS = (
+    'Green Leaf', 'Corner Market', 'Sunrise', 'Harbor', 'Main Street', 'Elevate', 'Northside',
+    'Cloud Nine', 'Urban Roots', 'Evergreen', 'Blue Door', 'High Tide', 'Summit', 'Golden Gate',
+)
+CITIES = (
+    'Portland', 'Denver', 'Austin', 'Phoenix', 'Seattle', 'Tucson', 'Reno', 'Boise',
+    'Oakland', 'Tacoma', 'Eugene', 'Spokane', 'Sacramento', 'Albuquerque',
+)
+ITEM_KINDS = ('Poster', 'Banner', 'Shelf Talker', 'Counter Mat', 'Window Cling', 'Display Rack',
+              'Sticker Pack', 'Tent Card', 'Floor Decal', 'Menu Board')
+TASKS = ('Follow up call', 'Send samples', 'Drop off P.O.P.', 'Schedule training',
+         'Confirm reorder', 'Collect feedback', 'Update pricing', 'Visit store')
+NOTES = ('Left voicemail.', 'Interested in the new line.', 'Asked for a price sheet.',
+         'Manager changed; introduce again.', 'Display looks great.', 'Wants a second banner.')
+
+
+def _weights(n, skew):
+    return [1 / (rank + 1) ** skew for rank in range(n)]
+
+
+def _recent(rng, span_days, today, bias=0.7):
+    """A datetime within ``span_days`` before ``today``, skewed toward recent."""
+    age = span_days * (1 - rng.random() ** bias)
+    return datetime.combine(today, dt_time()) - timedelta(days=age, seconds=rng.randrange(86400))
+
+
+def _chunks(rows, size=CHUNK_ROWS):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _bulk(model, rows):
+    total = 0
+    for chunk in _chunks(rows):
+        db.session.execute(insert(model), chunk)
+        db.session.commit()
+        total += len(chunk)
+    return total
+
+
+def _contacts(rng, n, today):
+    rep_weights = _weights(len(REPS), 0.8)
+    for i in range(1, n + 1):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        yield {
+            'id': i,
+            'name': f'{first} {last}',
+            'email': f'{first}.{last}{i}@{rng.choice(DOMAINS)}'.lower(),
+            'phone': f'+1555{rng.randrange(10 ** 7):07d}',
+            'tags': ','.join(rng.sample(TAGS, rng.choice((1, 1, 2, 3)))),
+            'notes': rng.choice(NOTES) if rng.random() < 0.3 else None,
+            'rep': rng.choices(REPS, rep_weights)[0],
+            'archived': rng.random() < 0.08,
+            'created_at': _recent(rng, 730, today),
+        }
+
+
+def _tasks(rng, n, contacts, today):
+    for i in range(1, n + 1):
+        due = today + timedelta(days=int(rng.gauss(0, 21)))
+        done = rng.random() < (0.75 if due < today else 0.1)
+        yield {
+            'id': i,
+            'contact_id': rng.randint(1, contacts),
+            'title': rng.choice(TASKS),
+            'due_date': due,
+            'status': 'completed' if done else 'pending',
+        }
+
+
+def _notes(rng, n, contacts, today):
+    for i in range(1, n + 1):
+        yield {
+            'id': i,
+            'contact_id': rng.randint(1, contacts),
+            'note': rng.choice(NOTES),
+            'timestamp': _recent(rng, 730, today),
+        }
+
+
+def _customers(rng, n):
+    rep_weights = _weights(len(REPS), 0.8)
+    for i in range(1, n + 1):
+        chain = rng.choice(CHAINS)
+        yield {
+            'id': i,
+            'po_number': f'PO-{100000 + i}',
+            'store_name': f'{chain} {rng.choice(CITIES)} #{i}',
+            'email': f'orders{i}@{rng.choice(DOMAINS)}',
+            'account_number': f'acct-{i:08d}',
+            'rep': rng.choices(REPS, rep_weights)[0],
+        }
+
+
+def _items(rng, n, now):
+    for i in range(1, n + 1):
+        kind = ITEM_KINDS[(i - 1) % len(ITEM_KINDS)]
+        yield {
+            'id': i,
+            'name': f'{kind} {chr(ord("A") + (i - 1) // len(ITEM_KINDS) % 26)}',
+            'description': f'{kind} for in-store promotion.',
+            'image_url': None,
+            'fee': rng.random() < 0.2,
+            'updated_at': now,
+        }
+
+
+def _order_status(rng, age_days):
+    if age_days > 30:
+        return rng.choices(('Shipped', 'Rejected', 'Approved', 'Pending'), (80, 5, 10, 5))[0]
+    if age_days > 7:
+        return rng.choices(('Shipped', 'Approved', 'Pending', 'Rejected'), (45, 35, 15, 5))[0]
+    return rng.choices(('Pending', 'Approved', 'Shipped', 'Rejected'), (60, 30, 8, 2))[0]
+
+
+def _orders(rng, n, customers, items, today):
+    item_weights = _weights(items, 1.1)
+    item_ids = list(range(1, items + 1))
+    now = datetime.combine(today, dt_time())
+    for i in range(1, n + 1):
+        stamp = _recent(rng, 365, today, bias=0.8)
+        # Stores mostly order on weekdays.
+        while stamp.weekday() >= 5 and rng.random() < 0.7:
+            stamp = _recent(rng, 365, today, bias=0.8)
+        yield {
+            'id': i,
+            # Squaring skews orders toward a minority of busy customers.
+            'customer_id': 1 + int(customers * rng.random() ** 2),
+            'item_id': rng.choices(item_ids, item_weights)[0],
+            'quantity': max(1, int(rng.expovariate(1 / 6))),
+            'note': 'Rush please' if rng.random() < 0.05 else None,
+            'status': _order_status(rng, (now - stamp).days),
+            'timestamp': stamp,
+        }
+
+
+def build_database(path, contacts, orders=None, tasks=None, notes=None, customers=None,
+                   items=50, seed=42, today=None, log=None):
+    """Create ``path`` and fill it; returns ``{table: rows}``.
+
+    Unset sizes default to ratios of ``contacts``: 2x tasks, 1x notes,
+    2x orders and one customer per 20 contacts.
+    """
+    orders = 2 * contacts if orders is None else orders
+    tasks = 2 * contacts if tasks is None else tasks
+    notes = contacts if notes is None else notes
+    customers = max(10, contacts // 20) if customers is None else customers
+    today = today or date.today()
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+
+    if os.path.exists(path):
+        os.remove(path)
+    app = Flask('crm-bench')
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.abspath(path)}'
+    db.init_app(app)
+    counts = {}
+    with app.app_context():
+        db.create_all()
+        db.session.execute(text('PRAGMA journal_mode=WAL'))
+        db.session.execute(text('PRAGMA synchronous=OFF'))
+        password = generate_password_hash('bench')
+        users = [{'username': 'bench', 'password_hash': password, 'role': 'admin'}]
+        users += [{'username': rep.lower(), 'password_hash': password, 'role': 'rep'} for rep in REPS]
+        counts['user'] = _bulk(User, users)
+
+        steps = (
+            ('contact', Contact, lambda: _contacts(rng, contacts, today)),
+            ('task', Task, lambda: _tasks(rng, tasks, max(contacts, 1), today)),
+            ('note', Note, lambda: _notes(rng, notes, max(contacts, 1), today)),
+            ('pop_item', PopItem, lambda: _items(rng, items, datetime.utcnow())),
+            ('customer', Customer, lambda: _customers(rng, customers)),
+            ('pop_order', PopOrder, lambda: _orders(rng, orders, customers, items, today)),
+        )
+        for table, model, rows in steps:
+            if table in ('task', 'note') and not contacts:
+                counts[table] = 0
+                continue
+            started = time.perf_counter()
+            counts[table] = _bulk(model, rows())
+            log(f'{table:10} {counts[table]:>12,} rows in {time.perf_counter() - started:6.1f}s')
+
+        counts['customer_fts'] = create_customer_fts()
+        started = time.perf_counter()
+        rebuild()
+        log(f'{"rollup":10} rebuilt in {time.perf_counter() - started:6.1f}s')
+        db.session.execute(text('ANALYZE'))
+        db.session.commit()
+        with db.engine.begin() as connection:
+            stamp_head(connection)
+        db.engine.dispose()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--out', default=os.path.join(ROOT, 'instance', 'crm-bench.db'))
+    parser.add_argument('--contacts', type=int, default=10000)
+    parser.add_argument('--orders', type=int)
+    parser.add_argument('--tasks', type=int)
+    parser.add_argument('--notes', type=int)
+    parser.add_argument('--customers', type=int)
+    parser.add_argument('--items', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = build_database(
+        args.out, args.contacts, orders=args.orders, tasks=args.tasks, notes=args.notes,
+        customers=args.customers, items=args.items, seed=args.seed, log=print,
+    )
+    total = sum(n for n in counts.values() if not isinstance(n, bool))
+    print(f'{total:,} rows written to {args.out} in {time.perf_counter() - started:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
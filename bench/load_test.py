@@ -0,0 +1,94 @@
+"""Drive a running CRM server with concurrent clients and report req/s.
+
+Each client logs in once, then loops over a mix of read and write routes
+until ``--duration`` expires.  Run it against the dev server and against
+gunicorn to compare:
+
+    python app.py &                                          # before
+    GUNICORN_BIND=127.0.0.1:5000 gunicorn -c gunicorn.conf.py wsgi:app &  # after
+    python bench/load_test.py --url http://127.0.0.1:5000 --user polina --password ...
+"""
+import argparse
+import http.cookiejar
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+ROUTES = (
+    ('GET', '/'),
+    ('GET', '/api/contacts'),
+    ('GET', '/admin/pop_orders'),
+    ('GET', '/admin/pop_orders?search=store'),
+    ('POST', '/api/pop_order'),
+)
+
+
+def client(args, deadline, results, lock, worker):
+    jar = http.cookiejar.CookieJar()
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+    form = urllib.parse.urlencode({'username': args.user, 'password': args.password}).encode()
+    opener.open(args.url + '/login', data=form).read()
+
+    latencies, errors, n = [], 0, 0
+    while time.monotonic() < deadline:
+        method, path = ROUTES[n % len(ROUTES)]
+        data, headers = None, {}
+        if method == 'POST':
+            data = json.dumps({
+                'store_name': f'Load Store {worker}',
+                'po_number': f'LOAD-{worker}-{n}',
+                'items': [{'item_id': 1, 'quantity': 1}],
+            }).encode()
+            headers = {'Content-Type': 'application/json'}
+        request = urllib.request.Request(args.url + path, data=data, headers=headers, method=method)
+        started = time.perf_counter()
+        try:
+            with opener.open(request, timeout=30) as response:
+                response.read()
+        except (urllib.error.URLError, TimeoutError, ConnectionError):
+            errors += 1
+        latencies.append(time.perf_counter() - started)
+        n += 1
+    with lock:
+        results['latencies'].extend(latencies)
+        results['errors'] += errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--user', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=20.0)
+    args = parser.parse_args()
+
+    results, lock = {'latencies': [], 'errors': 0}, threading.Lock()
+    deadline = time.monotonic() + args.duration
+    threads = [threading.Thread(target=client, args=(args, deadline, results, lock, i))
+               for i in range(args.concurrency)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    latencies = sorted(results['latencies'])
+    print(json.dumps({
+        'url': args.url,
+        'concurrency': args.concurrency,
+        'requests': len(latencies),
+        'errors': results['errors'],
+        'requests_per_second': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 1) if latencies else None,
+        'p99_ms': round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 1) if latencies else None,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+"""Repeatable route benchmarks through the Flask test client.
+
+Copies a database built by ``generate_data.py`` (or builds one with
+``--build``) into a scratch directory, then times the main routes in
+process and writes p50/p99 latency and throughput per scenario to JSON:
+
+    python bench/generate_data.py --contacts 100000 --out /tmp/crm-bench.db
+    python bench/run_benchmarks.py --db /tmp/crm-bench.db --out before.json
+    ... change something ...
+    python bench/run_benchmarks.py --db /tmp/crm-bench.db --out after.json --compare before.json
+
+Each run starts from a fresh copy, so ingestion writes never leak into the
+next run.  The dashboard cache TTL is forced to 0 so every dashboard request
+does the real work.  ``--compare`` prints the change per scenario and exits
+with status 1 if any p50/p99 got slower by more than ``--threshold``.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from generate_data import CHAINS, CITIES, REPS, build_database  # noqa: E402
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(p * len(sorted_values)) - 1)]
+
+
+def summarise(latencies, elapsed, errors):
+    latencies = sorted(latencies)
+    ms = lambda seconds: round(seconds * 1000, 2) if seconds is not None else None  # noqa: E731
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'p50_ms': ms(percentile(latencies, 0.50)),
+        'p99_ms': ms(percentile(latencies, 0.99)),
+        'mean_ms': ms(sum(latencies) / len(latencies)) if latencies else None,
+        'max_ms': ms(latencies[-1]) if latencies else None,
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+    }
+
+
+def run_scenario(client, make_request, iterations, warmup):
+    for n in range(warmup):
+        make_request(client, n).close()
+    latencies, errors = [], 0
+    started = time.perf_counter()
+    for n in range(iterations):
+        t = time.perf_counter()
+        response = make_request(client, n)
+        # Drain streamed bodies so exports are timed end to end.
+        for _ in response.response:
+            pass
+        response.close()
+        latencies.append(time.perf_counter() - t)
+        if response.status_code >= 400:
+            errors += 1
+    return summarise(latencies, time.perf_counter() - started, errors)
+
+
+def scenarios(seed):
+    rng = random.Random(seed)
+    terms = [rng.choice(CHAINS + CITIES + REPS).split()[0] for _ in range(64)]
+
+    def get(path):
+        return lambda client, n: client.get(path, buffered=False)
+
+    def search(client, n):
+        return client.get(f'/admin/pop_orders?search={terms[n % len(terms)]}', buffered=False)
+
+    def search_status(client, n):
+        status = ('Pending', 'Approved')[n % 2]
+        return client.get(f'/admin/pop_orders?search={terms[n % len(terms)]}&status={status}',
+                          buffered=False)
+
+    def ingest(client, n):
+        return client.post('/api/pop_order', json={
+            'store_name': f'Bench Store {n % 500}',
+            'po_number': f'BENCH-{seed}-{n}',
+            'email': f'bench{n % 500}@example.com',
+            'items': [{'item_id': 1 + n % 50, 'quantity': 1 + n % 5}],
+        })
+
+    # (name, request, iterations multiplier)
+    return (
+        ('dashboard', get('/'), 1),
+        ('api_contacts', get('/api/contacts'), 1),
+        ('admin_orders', get('/admin/pop_orders'), 1),
+        ('admin_orders_search', search, 1),
+        ('admin_orders_search_status', search_status, 1),
+        ('export_orders_csv', get('/admin/pop_orders/export'), 0),
+        ('export_contacts_csv', get('/export'), 0),
+        ('ingest_pop_order', ingest, 2),
+    )
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def table_counts(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {table: conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+                for table in ('contact', 'task', 'note', 'customer', 'pop_item', 'pop_order')}
+    finally:
+        conn.close()
+
+
+def compare(results, baseline, threshold):
+    """Print per-scenario changes; returns the names of regressed scenarios."""
+    regressed = []
+    print(f'{"scenario":28} {"p50":>18} {"p99":>18} {"rps":>18}')
+    for name, current in results['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if not before:
+            print(f'{name:28} (new)')
+            continue
+        cells, worse = [], False
+        for key, lower_is_better in (('p50_ms', True), ('p99_ms', True), ('throughput_rps', False)):
+            old, new = before.get(key), current.get(key)
+            if not old or new is None:
+                cells.append(f'{"-":>18}')
+                continue
+            change = (new - old) / old
+            cells.append(f'{old:>7} -> {new:<7}{change:+.0%}'.rjust(18))
+            if lower_is_better and change > threshold:
+                worse = True
+        print(f'{name:28} ' + ' '.join(cells) + ('  REGRESSED' if worse else ''))
+        if worse:
+            regressed.append(name)
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', help='database built by generate_data.py (copied, never modified)')
+    parser.add_argument('--build', type=int, metavar='CONTACTS',
+                        help='build a fresh database with this many contacts instead of --db')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--export-iterations', type=int, default=3)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--only', nargs='*', help='run just these scenarios')
+    parser.add_argument('--out', default='bench_results.json')
+    parser.add_argument('--compare', help='previous results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='fractional p50/p99 slowdown counted as a regression (default 0.2)')
+    args = parser.parse_args()
+    if not args.db and not args.build:
+        parser.error('pass --db or --build')
+
+    workdir = tempfile.mkdtemp(prefix='crm-bench-')
+    db_path = os.path.join(workdir, 'crm.db')
+    if args.build:
+        print(f'Building {args.build:,} contacts in {db_path} ...')
+        build_database(db_path, args.build, seed=args.seed, log=print)
+    else:
+        shutil.copyfile(args.db, db_path)
+
+    from app import create_app
+    from ingest import pipeline
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+        'INGEST_QUEUE_PATH': os.path.join(workdir, 'queue.db'),
+        'INGEST_BACKGROUND_FLUSH': False,
+        'OUTBOX_WORKERS': 0,
+        'BACKUP_INTERVAL': 0,
+        'SECRET_KEY': 'bench',
+        'DASHBOARD_CACHE_TTL': 0,
+    })
+    client = app.test_client()
+    client.post('/login', data={'username': 'bench', 'password': 'bench'})
+
+    results = {
+        'meta': {
+            'started_at': datetime.utcnow().isoformat(timespec='seconds'),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'iterations': args.iterations,
+            'rows': table_counts(db_path),
+        },
+        'scenarios': {},
+    }
+    for name, make_request, multiplier in scenarios(args.seed):
+        if args.only and name not in args.only:
+            continue
+        iterations = args.iterations * multiplier if multiplier else args.export_iterations
+        warmup = args.warmup if multiplier else 1
+        result = run_scenario(client, make_request, iterations, warmup)
+        results['scenarios'][name] = result
+        print(f'{name:28} p50={result["p50_ms"]:>9} ms  p99={result["p99_ms"]:>9} ms  '
+              f'{result["throughput_rps"]:>8} req/s  errors={result["errors"]}')
+
+    if 'ingest_pop_order' in results['scenarios']:
+        queued = pipeline.stats()['queue_depth']
+        started = time.perf_counter()
+        with app.app_context():
+            applied = pipeline.flush()
+        elapsed = time.perf_counter() - started
+        results['scenarios']['ingest_flush'] = {
+            'orders': applied,
+            'queued': queued,
+            'seconds': round(elapsed, 3),
+            'throughput_rps': round(applied / elapsed, 1) if elapsed else None,
+        }
+        print(f'{"ingest_flush":28} {applied} orders in {elapsed:.2f}s')
+
+    with open(args.out, 'w') as out:
+        json.dump(results, out, indent=2)
+    print(f'Results written to {args.out}')
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Local SMTP stand-in for testing the notification outbox.
+
+Accepts every message and prints it (or appends it to ``--mbox``); nothing
+is relayed.  ``--fail-rate`` rejects that fraction of DATA commands with a
+transient 451 so the outbox retry/backoff path can be exercised:
+
+    python bench/smtp_sink.py --port 1025 --fail-rate 0.2
+"""
+import argparse
+import random
+import socketserver
+import sys
+import threading
+from datetime import datetime
+
+_write_lock = threading.Lock()
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write((line + '\r\n').encode('ascii'))
+
+    def handle(self):
+        self.reply('220 smtp-sink ready')
+        sender, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command[:4].upper()
+            if verb in ('HELO', 'EHLO'):
+                self.reply('250 smtp-sink')
+            elif verb == 'MAIL':
+                sender, recipients = command[10:].strip(), []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                recipients.append(command[8:].strip())
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                body = []
+                while True:
+                    data = self.rfile.readline()
+                    if not data or data in (b'.\r\n', b'.\n'):
+                        break
+                    body.append(data[1:] if data.startswith(b'..') else data)
+                if random.random() < self.server.fail_rate:
+                    self.reply('451 Try again later')
+                else:
+                    self.server.deliver(sender, recipients, b''.join(body))
+                    self.reply('250 OK queued')
+                sender, recipients = None, []
+            elif verb == 'RSET':
+                sender, recipients = None, []
+                self.reply('250 OK')
+            elif verb == 'NOOP':
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, fail_rate=0.0, mbox=None):
+        super().__init__(address, SMTPHandler)
+        self.fail_rate = fail_rate
+        self.mbox = mbox
+        self.received = 0
+
+    def deliver(self, sender, recipients, body):
+        with _write_lock:
+            self.received += 1
+            header = f'From {sender.strip("<>") or "-"} {datetime.utcnow().ctime()}\n'
+            text = body.decode('utf-8', 'replace').replace('\r\n', '\n')
+            if self.mbox:
+                with open(self.mbox, 'a', encoding='utf-8') as out:
+                    out.write(header + text + '\n')
+            else:
+                sys.stdout.write(f'--- message {self.received} to {", ".join(recipients)}\n{text}\n')
+                sys.stdout.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=1025)
+    parser.add_argument('--fail-rate', type=float, default=0.0)
+    parser.add_argument('--mbox', help='append messages to this file instead of printing them')
+    args = parser.parse_args()
+    with SMTPSink((args.host, args.port), args.fail_rate, args.mbox) as server:
+        print(f'smtp-sink listening on {args.host}:{args.port}', file=sys.stderr)
+        server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""P.O.P. item catalog for the store order page, plus image thumbnails.
+
+The catalog is read once and cached in-process for ``CATALOG_CACHE_TTL``
+seconds.  Commits that touch ``pop_item`` drop this process's copy at once;
+an item edited through another worker appears here when the copy expires.
+Each cached catalog carries an ETag (a hash of its contents) and the newest
+``updated_at`` so ``/pop_items`` can answer repeat visits with 304s.
+
+Thumbnails are cropped to ``THUMBNAIL_SIZE`` with Pillow and written to
+``instance/thumbnails`` under a hash of the source URL and size, so an item
+whose image changes gets a new file and the old one is never served again.
+They are built in the background whenever the catalog is reloaded.  Without
+Pillow, or when a source can't be fetched, the page falls back to the
+original ``image_url``.
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+
+from models import PopItem, invalidate_on_commit
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = ImageOps = None
+
+logger = logging.getLogger(__name__)
+
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+FETCH_TIMEOUT = 10
+FAILURE_RETRY = 300
+
+_cache = {}
+_cache_lock = threading.Lock()
+_thumb_locks = {}
+_failures = {}
+
+
+def invalidate():
+    with _cache_lock:
+        _cache.clear()
+
+
+invalidate_on_commit(PopItem, invalidate)
+
+
+def thumbnail_key(image_url, size):
+    return hashlib.sha256(f'{size[0]}x{size[1]}:{image_url}'.encode()).hexdigest()[:16]
+
+
+def load_catalog(ttl=300, size=(640, 320), warm=None):
+    """Return the cached catalog dict: ``items``, ``by_id``, ``etag``, ``last_modified``.
+
+    ``warm`` is an optional callable run with the item list whenever the
+    catalog is reloaded from the database.
+    """
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _cache.get(size)
+        if cached and cached[0] > now:
+            return cached[1]
+
+    items, last_modified = [], None
+    for item in PopItem.query.order_by(PopItem.id):
+        items.append({
+            'id': item.id,
+            'name': item.name,
+            'description': item.description,
+            'image_url': item.image_url,
+            'fee': bool(item.fee),
+            'thumb': thumbnail_key(item.image_url, size) if item.image_url else None,
+        })
+        if item.updated_at and (last_modified is None or item.updated_at > last_modified):
+            last_modified = item.updated_at
+    catalog = {
+        'items': items,
+        'by_id': {item['id']: item for item in items},
+        'etag': hashlib.sha256(json.dumps(items, sort_keys=True).encode()).hexdigest()[:32],
+        'last_modified': last_modified.replace(microsecond=0) if last_modified else None,
+    }
+    with _cache_lock:
+        _cache[size] = (now + ttl, catalog)
+    if warm is not None:
+        warm(items)
+    return catalog
+
+
+def _read_source(image_url, root):
+    if image_url.startswith(('http://', 'https://')):
+        with urllib.request.urlopen(image_url, timeout=FETCH_TIMEOUT) as response:
+            data = response.read(MAX_IMAGE_BYTES + 1)
+    else:
+        # Site-relative paths like /static/pop/banner.png live under the app.
+        path = os.path.realpath(os.path.join(root, image_url.lstrip('/')))
+        if not path.startswith(os.path.realpath(root) + os.sep):
+            raise ValueError(f"image path outside the app: {image_url}")
+        with open(path, 'rb') as source:
+            data = source.read(MAX_IMAGE_BYTES + 1)
+    if len(data) > MAX_IMAGE_BYTES:
+        raise ValueError(f"image larger than {MAX_IMAGE_BYTES} bytes: {image_url}")
+    return data
+
+
+def _render(data, path, size):
+    with Image.open(io.BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source)
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            flat = Image.new('RGB', image.size, 'white')
+            flat.paste(image, mask=image.getchannel('A'))
+            image = flat
+        else:
+            image = image.convert('RGB')
+        image = ImageOps.fit(image, size, Image.LANCZOS)
+        image.save(path + '.part', 'JPEG', quality=80, optimize=True, progressive=True)
+    os.replace(path + '.part', path)
+
+
+def thumbnail(image_url, directory, size, root):
+    """Return the path of the cached thumbnail, building it if needed.
+
+    Returns ``None`` when Pillow is missing or the source can't be read;
+    failures are remembered for ``FAILURE_RETRY`` seconds.
+    """
+    if Image is None or not image_url:
+        return None
+    key = thumbnail_key(image_url, size)
+    path = os.path.join(directory, f'{key}.jpg')
+    if os.path.exists(path):
+        return path
+    if _failures.get(key, 0) > time.monotonic():
+        return None
+    with _cache_lock:
+        lock = _thumb_locks.setdefault(key, threading.Lock())
+    with lock:
+        if os.path.exists(path):
+            return path
+        try:
+            os.makedirs(directory, exist_ok=True)
+            _render(_read_source(image_url, root), path, size)
+        except Exception as e:
+            logger.warning("Could not build thumbnail for %s: %s", image_url, e)
+            _failures[key] = time.monotonic() + FAILURE_RETRY
+            return None
+    return path
+
+
+def warm_thumbnails(items, directory, size, root):
+    """Build missing thumbnails for ``items`` on a background thread."""
+    if Image is None:
+        return
+
+    def run():
+        for item in items:
+            thumbnail(item['image_url'], directory, size, root)
+
+    threading.Thread(target=run, name='pop-thumbnails', daemon=True).start()
@@ -0,0 +1,250 @@
+"""Bulk contact import from CSV or JSON Lines.
+
+The upload is read row by row, normalised, and applied in chunks of
+``IMPORT_CHUNK_ROWS``: one indexed ``lower(email)`` lookup per chunk finds
+existing contacts, then new rows go in with a single ``executemany`` INSERT
+and matches with a single ``executemany`` UPDATE, each chunk in its own
+transaction.  Rows that fail validation are written to a CSV report under
+``instance/imports`` instead of aborting the import.  Reports hold the
+rejected rows verbatim, contact details included, so each import first
+deletes reports older than ``IMPORT_REPORT_RETENTION`` seconds.
+"""
+import csv
+import io
+import json
+import os
+import re
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import bindparam, func, insert, select, update
+
+from models import db, Contact, Task
+from metrics import bump, invalidate
+
+IMPORT_CHUNK_ROWS = 2000
+IMPORT_REPORT_RETENTION = 7 * 24 * 60 * 60
+FIELDS = ('name', 'email', 'phone', 'rep', 'tags', 'notes')
+HEADER_ALIASES = {
+    'full_name': 'name',
+    'contact_name': 'name',
+    'e-mail': 'email',
+    'email_address': 'email',
+    'phone_number': 'phone',
+    'mobile': 'phone',
+    'sales_rep': 'rep',
+    'tag': 'tags',
+    'note': 'notes',
+}
+EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+
+class RowError(ValueError):
+    pass
+
+
+def normalise_email(value):
+    email = (value or '').strip().lower()
+    if email and not EMAIL_RE.match(email):
+        raise RowError(f"invalid email '{value}'")
+    return email or None
+
+
+def normalise_phone(value):
+    """Return the phone as +<digits>, assuming US numbers for 10 digits."""
+    raw = (value or '').strip()
+    if not raw:
+        return None
+    digits = re.sub(r'\D', '', raw)
+    if len(digits) == 10 and not raw.startswith('+'):
+        digits = '1' + digits
+    if not 8 <= len(digits) <= 15:
+        raise RowError(f"invalid phone '{value}'")
+    return '+' + digits
+
+
+def normalise_row(raw):
+    row = {}
+    for key, value in raw.items():
+        if key is None:
+            continue
+        field = key.strip().lower().replace(' ', '_')
+        field = HEADER_ALIASES.get(field, field)
+        if field in FIELDS:
+            row[field] = str(value).strip() if value is not None else ''
+    row['email'] = normalise_email(row.get('email'))
+    row['phone'] = normalise_phone(row.get('phone'))
+    for field in ('name', 'rep', 'tags', 'notes'):
+        row[field] = row.get(field) or None
+    if not row['name'] and not row['email']:
+        raise RowError("row needs a name or an email")
+    return row
+
+
+def read_rows(stream, fmt):
+    """Yield ``(line_number, raw_dict_or_error)`` from a binary upload stream."""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', errors='replace', newline='')
+    if fmt == 'jsonl':
+        for number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                value = json.loads(line)
+            except ValueError:
+                yield number, RowError("invalid JSON"), line.strip()
+                continue
+            if not isinstance(value, dict):
+                yield number, RowError("expected a JSON object"), line.strip()
+                continue
+            yield number, value, line.strip()
+    else:
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, record, ','.join(v or '' for v in record.values() if isinstance(v, str))
+
+
+class ImportReport:
+    """Summary counters plus the per-row error CSV."""
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.import_id = uuid.uuid4().hex
+        self.path = os.path.join(directory, f'{self.import_id}.csv')
+        self._file = None
+        self._writer = None
+        self.counts = Counter()
+
+    def error(self, line, message, raw):
+        if self._writer is None:
+            self._file = open(self.path, 'w', newline='', encoding='utf-8')
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(['line', 'error', 'row'])
+        self._writer.writerow([line, message, raw])
+        self.counts['errors'] += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+    @property
+    def has_errors(self):
+        return self.counts['errors'] > 0
+
+
+def _apply_chunk(chunk):
+    """Upsert one chunk of ``(line, row)`` pairs; returns (inserted, updated)."""
+    by_email, no_email = {}, []
+    for line, row in chunk:
+        if row['email']:
+            # Later rows for the same address win, as they would row by row.
+            by_email[row['email']] = row
+        else:
+            no_email.append(row)
+
+    existing = {}
+    if by_email:
+        for contact_id, email, rep, archived in db.session.execute(
+            select(Contact.id, func.lower(Contact.email), Contact.rep, Contact.archived)
+            .where(func.lower(Contact.email).in_(list(by_email)))
+        ):
+            existing.setdefault(email, (contact_id, rep, archived))
+
+    now = datetime.utcnow()
+    inserts = [dict(row, archived=False, created_at=now) for row in no_email]
+    updates, moved = [], {}
+    for email, row in by_email.items():
+        if email not in existing:
+            inserts.append(dict(row, archived=False, created_at=now))
+            continue
+        contact_id, old_rep, archived = existing[email]
+        # Blank cells keep what the CRM already has.
+        changes = {field: row[field] for field in FIELDS if row[field] is not None}
+        update_row = {'_id': contact_id}
+        for field in FIELDS:
+            update_row[field] = changes.get(field)
+        updates.append(update_row)
+        if 'rep' in changes and changes['rep'] != old_rep:
+            moved[contact_id] = (old_rep, changes['rep'], archived)
+
+    if inserts:
+        db.session.execute(insert(Contact), inserts)
+    if updates:
+        table = Contact.__table__
+        db.session.execute(
+            update(table)
+            .where(table.c.id == bindparam('_id'))
+            .values({field: func.coalesce(bindparam(field), table.c[field]) for field in FIELDS}),
+            updates,
+        )
+    _update_rollup(inserts, moved)
+    db.session.commit()
+    return len(inserts), len(updates)
+
+
+def _update_rollup(inserts, moved):
+    """Mirror what metrics.py does for ORM flushes; core statements skip it."""
+    deltas = Counter()
+    for row in inserts:
+        deltas[(row['rep'], None, 'contacts')] += 1
+    for old_rep, new_rep, archived in moved.values():
+        if not archived:
+            deltas[(old_rep, None, 'contacts')] -= 1
+            deltas[(new_rep, None, 'contacts')] += 1
+    if moved:
+        for contact_id, due, status, n in db.session.execute(
+            select(Task.contact_id, Task.due_date, Task.status, func.count())
+            .where(Task.contact_id.in_(list(moved)))
+            .group_by(Task.contact_id, Task.due_date, Task.status)
+        ):
+            old_rep, new_rep, _ = moved[contact_id]
+            column = 'completed' if status == 'completed' else 'pending'
+            deltas[(old_rep, due, column)] -= n
+            deltas[(new_rep, due, column)] += n
+    for (rep, day, column), n in deltas.items():
+        if n:
+            bump(db.session, rep, day, **{column: n})
+
+
+def prune_reports(directory, max_age):
+    """Delete error reports last written more than ``max_age`` seconds ago."""
+    if not os.path.isdir(directory):
+        return
+    cutoff = time.time() - max_age
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.endswith('.csv') and os.path.getmtime(path) < cutoff:
+            os.remove(path)
+
+
+def import_contacts(stream, fmt, report_dir, chunk_rows=IMPORT_CHUNK_ROWS,
+                    report_retention=IMPORT_REPORT_RETENTION):
+    """Import an uploaded file and return its ``ImportReport``."""
+    prune_reports(report_dir, report_retention)
+    report = ImportReport(report_dir)
+    chunk = []
+    try:
+        for line, record, raw in read_rows(stream, fmt):
+            report.counts['rows'] += 1
+            if isinstance(record, RowError):
+                report.error(line, str(record), raw)
+                continue
+            try:
+                chunk.append((line, normalise_row(record)))
+            except RowError as e:
+                report.error(line, str(e), raw)
+                continue
+            if len(chunk) >= chunk_rows:
+                inserted, updated = _apply_chunk(chunk)
+                report.counts['inserted'] += inserted
+                report.counts['updated'] += updated
+                chunk = []
+        if chunk:
+            inserted, updated = _apply_chunk(chunk)
+            report.counts['inserted'] += inserted
+            report.counts['updated'] += updated
+    finally:
+        report.close()
+        invalidate()
+    return report
@@ -0,0 +1,51 @@
+"""Query helpers for the dashboard contact grid.
+
+The grid pulls contacts a page at a time from ``/api/contacts``.  Pages are
+keyset-paginated on ``contact.id`` and each page's tasks come from one
+``selectinload`` query, so the cost of a page does not depend on how many
+contacts or tasks exist overall.
+"""
+from sqlalchemy.orm import selectinload
+
+from models import Contact
+
+
+def contacts_page(rep=None, tag=None, archived=False, after=None, limit=24):
+    """Return ``(contacts, next_cursor)`` with ``tasks`` already loaded."""
+    query = Contact.query.options(selectinload(Contact.tasks))
+    if archived:
+        query = query.filter(Contact.archived.is_(True))
+    else:
+        query = query.filter(Contact.archived.isnot(True))
+    if rep:
+        query = query.filter(Contact.rep == rep)
+    if tag:
+        query = query.filter(Contact.tags.ilike(f'%{tag}%'))
+    if after:
+        query = query.filter(Contact.id > after)
+    contacts = query.order_by(Contact.id).limit(limit + 1).all()
+    next_cursor = contacts[limit - 1].id if len(contacts) > limit else None
+    return contacts[:limit], next_cursor
+
+
+def contact_json(contact):
+    return {
+        'id': contact.id,
+        'name': contact.name,
+        'email': contact.email,
+        'phone': contact.phone,
+        'rep': contact.rep,
+        'tags': contact.tags,
+        'notes': contact.notes,
+        'archived': bool(contact.archived),
+        'tasks': [
+            {
+                'id': task.id,
+                'title': task.title,
+                'due_date': task.due_date.isoformat() if task.due_date else None,
+                'status': task.status,
+                'urgency': task.urgency,
+            }
+            for task in contact.tasks
+        ],
+    }
@@ -0,0 +1,94 @@
+"""Streaming CSV exports for P.O.P. orders and contacts.
+
+Rows are read with ``yield_per`` (a server-side cursor on Postgres, an
+incrementally stepped cursor on SQLite) and encoded in fixed-size chunks,
+so memory stays flat no matter how large ``pop_order`` or ``contact`` get.
+"""
+import csv
+import io
+import zlib
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from models import db, Contact, Customer, PopItem, PopOrder
+from pop_orders import order_filters
+
+EXPORT_CHUNK_ROWS = 1000
+
+ORDER_COLUMNS = (
+    ('Order ID', PopOrder.id),
+    ('Submitted', PopOrder.timestamp),
+    ('Status', PopOrder.status),
+    ('Store', Customer.store_name),
+    ('PO #', Customer.po_number),
+    ('Email', Customer.email),
+    ('Rep', Customer.rep),
+    ('Item', PopItem.name),
+    ('Qty', PopOrder.quantity),
+    ('Note', PopOrder.note),
+)
+
+CONTACT_COLUMNS = (
+    ('ID', Contact.id),
+    ('Name', Contact.name),
+    ('Email', Contact.email),
+    ('Phone', Contact.phone),
+    ('Rep', Contact.rep),
+    ('Tags', Contact.tags),
+    ('Notes', Contact.notes),
+    ('Archived', Contact.archived),
+    ('Created', Contact.created_at),
+)
+
+
+def order_export_query(search=None, status=None, start=None, end=None):
+    columns = [column for _, column in ORDER_COLUMNS]
+    return (
+        select(*columns)
+        .select_from(PopOrder)
+        .outerjoin(Customer, PopOrder.customer_id == Customer.id)
+        .outerjoin(PopItem, PopOrder.item_id == PopItem.id)
+        .where(*order_filters(search, status, start, end))
+        .order_by(PopOrder.id)
+    )
+
+
+def contact_export_query(status=None, start=None, end=None):
+    """``status`` is 'active' or 'archived'; dates filter ``created_at``."""
+    columns = [column for _, column in CONTACT_COLUMNS]
+    query = select(*columns).order_by(Contact.id)
+    if status == 'active':
+        query = query.where(Contact.archived.isnot(True))
+    elif status == 'archived':
+        query = query.where(Contact.archived.is_(True))
+    if start:
+        query = query.where(Contact.created_at >= datetime.combine(start, datetime.min.time()))
+    if end:
+        query = query.where(Contact.created_at < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+    return query
+
+
+def csv_chunks(header, query, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Yield UTF-8 CSV text ``chunk_rows`` rows at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    result = db.session.execute(query.execution_options(yield_per=chunk_rows))
+    for partition in result.partitions():
+        writer.writerows(partition)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def gzip_chunks(chunks, level=6):
+    """Compress an iterable of bytes into a gzip stream on the fly."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
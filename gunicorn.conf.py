@@ -0,0 +1,31 @@
+"""Gunicorn settings, overridable from the environment.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+
+# Behind nginx or a hosting platform's router, also export PROXY_HOPS=1 (one
+# per proxy in front) so the app sees client IPs instead of the proxy's.
+
+# SQLite allows one writer at a time, so a few processes with several
+# threads each beats many single-threaded processes.  Raise WEB_CONCURRENCY
+# when running against Postgres.
+workers = int(os.environ.get('WEB_CONCURRENCY', min(4, multiprocessing.cpu_count() + 1)))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+
+# Each worker starts its own P.O.P. order flusher and outbox threads when it
+# imports wsgi.py; preloading would start them in the master, where they do
+# not survive fork.
+preload_app = False
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
@@ -0,0 +1,548 @@
+"""Write-ahead ingestion pipeline for P.O.P. orders posted by Wix.
+
+Orders are validated on the request thread and appended to a small SQLite
+queue file next to ``crm.db``; a background flusher drains that queue into
+``customer``/``pop_order`` in batched transactions.  The highest applied
+queue sequence is stored in ``ingest_checkpoint`` in the same transaction as
+the rows, so a crash between commit and queue trim never double-applies, and
+the checkpoint is advanced conditionally so flushers in several worker
+processes never apply the same entries twice.  Checkpoints are keyed by a
+UUID stored in the queue file, so a recreated file starts from zero instead
+of having its entries skipped as already applied.  If a batch fails for any
+reason other than the database being unavailable, its orders are retried one
+at a time and any that still fail are moved to ``ingest_dead_letter`` with
+the error, so one bad order cannot hold up the ones behind it.
+
+Wix retries webhooks on timeout, so every submission carries an idempotency
+key (the ``Idempotency-Key`` header, or a hash of the PO number and item
+lines).  Keys are stored in the queue file in the same transaction as the
+queued order and fronted by a small in-memory LRU; a replay gets the
+original response back without queueing anything.
+"""
+import atexit
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from models import db, Customer, PopItem, PopOrder, IngestCheckpoint, IngestDeadLetter
+
+logger = logging.getLogger(__name__)
+
+# Queue sequences restart when the queue file is recreated, so checkpoints
+# are kept per queue file: ``pop_order:<queue_id>``.  Files created before
+# queue ids existed keep the bare name their checkpoint was stored under.
+CHECKPOINT_NAME = 'pop_order'
+LEGACY_QUEUE_ID = 'legacy'
+
+
+# Anything the flusher could not store must be refused here: once queued, an
+# order that fails to apply would otherwise block every order behind it.
+MAX_ID = 2 ** 31 - 1
+MAX_QUANTITY = 100000
+MAX_ITEMS = 200
+MAX_NOTE_LENGTH = 2000
+FIELD_LENGTHS = {
+    'store_name': Customer.__table__.c.store_name.type.length,
+    'po_number': Customer.__table__.c.po_number.type.length,
+    'email': Customer.__table__.c.email.type.length,
+    'rep': Customer.__table__.c.rep.type.length,
+    'note': MAX_NOTE_LENGTH,
+}
+
+
+def validate_order(data):
+    """Return a normalised order dict or raise ``ValueError``."""
+    if not isinstance(data, dict):
+        raise ValueError("Order payload must be a JSON object")
+
+    order = {}
+    for field in ('store_name', 'po_number'):
+        value = str(data.get(field) or '').strip()
+        if not value:
+            raise ValueError(f"'{field}' is required")
+        order[field] = value
+    for field in ('email', 'rep', 'note'):
+        value = data.get(field)
+        order[field] = str(value).strip() if value is not None else None
+    for field, length in FIELD_LENGTHS.items():
+        if order[field] is not None and len(order[field]) > length:
+            raise ValueError(f"'{field}' must be at most {length} characters")
+
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        raise ValueError("'items' must be a non-empty list")
+    if len(items) > MAX_ITEMS:
+        raise ValueError(f"An order can have at most {MAX_ITEMS} items")
+    order['items'] = []
+    for line in items:
+        if not isinstance(line, dict):
+            raise ValueError("Each item must be an object")
+        try:
+            item_id = int(line.get('item_id'))
+            quantity = int(line.get('quantity'))
+        except (TypeError, ValueError):
+            raise ValueError("Each item needs an integer 'item_id' and 'quantity'")
+        if not 0 < item_id <= MAX_ID:
+            raise ValueError("Unknown 'item_id'")
+        if not 0 < quantity <= MAX_QUANTITY:
+            raise ValueError(f"Item quantity must be between 1 and {MAX_QUANTITY}")
+        order['items'].append({'item_id': item_id, 'quantity': quantity})
+    return order
+
+
+def order_fingerprint(order):
+    """Fallback idempotency key for callers that don't send one."""
+    lines = sorted((line['item_id'], line['quantity']) for line in order['items'])
+    raw = order['po_number'] + '|' + ';'.join(f'{item_id}x{qty}' for item_id, qty in lines)
+    return 'auto:' + hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """Bounded LRU of idempotency key -> response body, with expiry."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, body = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return body
+
+    def put(self, key, body):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+class OrderQueue:
+    """Append-only queue of raw orders stored in its own SQLite file."""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=FULL')
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            legacy = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'queued_order'"
+            ).fetchone() is not None
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS queued_order ('
+                ' seq INTEGER PRIMARY KEY AUTOINCREMENT,'
+                ' payload TEXT NOT NULL,'
+                ' received_at TEXT NOT NULL)'
+            )
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS idempotency_key ('
+                ' key TEXT PRIMARY KEY,'
+                ' response TEXT NOT NULL,'
+                ' created_at TEXT NOT NULL)'
+            )
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS queue_meta ('
+                ' key TEXT PRIMARY KEY,'
+                ' value TEXT NOT NULL)'
+            )
+            row = self._conn.execute("SELECT value FROM queue_meta WHERE key = 'queue_id'").fetchone()
+            if row is None:
+                self.queue_id = LEGACY_QUEUE_ID if legacy else uuid.uuid4().hex
+                self._conn.execute("INSERT INTO queue_meta (key, value) VALUES ('queue_id', ?)", (self.queue_id,))
+            else:
+                self.queue_id = row[0]
+            self._conn.execute('COMMIT')
+        except Exception:
+            self._conn.execute('ROLLBACK')
+            raise
+
+    @property
+    def checkpoint_name(self):
+        """``ingest_checkpoint`` row tracking this file's sequences."""
+        if self.queue_id == LEGACY_QUEUE_ID:
+            return CHECKPOINT_NAME
+        return f'{CHECKPOINT_NAME}:{self.queue_id}'
+
+    def append(self, order, received_at, key, response):
+        """Queue ``order`` unless ``key`` was seen before.
+
+        Returns ``(response, replayed)``; ``response`` is stored alongside the
+        key for fresh orders, and a replay gets the stored one back.
+        """
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._conn.execute(
+                    'SELECT response FROM idempotency_key WHERE key = ?', (key,)
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute('ROLLBACK')
+                    return json.loads(row[0]), True
+                self._conn.execute(
+                    'INSERT INTO queued_order (payload, received_at) VALUES (?, ?)',
+                    (json.dumps(order), received_at.isoformat()),
+                )
+                self._conn.execute(
+                    'INSERT INTO idempotency_key (key, response, created_at) VALUES (?, ?, ?)',
+                    (key, json.dumps(response), received_at.isoformat()),
+                )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return response, False
+
+    def expire_keys(self, before):
+        with self._lock:
+            self._conn.execute('DELETE FROM idempotency_key WHERE created_at < ?', (before.isoformat(),))
+
+    def peek(self, limit):
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT seq, payload, received_at FROM queued_order ORDER BY seq LIMIT ?',
+                (limit,),
+            ).fetchall()
+        return [(seq, json.loads(payload), datetime.fromisoformat(received_at))
+                for seq, payload, received_at in rows]
+
+    def trim(self, upto_seq):
+        with self._lock:
+            self._conn.execute('DELETE FROM queued_order WHERE seq <= ?', (upto_seq,))
+
+    def depth(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM queued_order').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class IngestPipeline:
+    def __init__(self, app=None):
+        self.app = None
+        self.queue = None
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pending = 0
+        self.counters = {
+            'orders_queued': 0,
+            'replays': 0,
+            'orders_flushed': 0,
+            'rows_written': 0,
+            'batches_flushed': 0,
+            'flush_failures': 0,
+            'orders_dead_lettered': 0,
+            'orders_discarded': 0,
+            'last_batch_size': 0,
+            'max_batch_size': 0,
+            'last_flush_seconds': 0.0,
+            'max_flush_seconds': 0.0,
+            'total_flush_seconds': 0.0,
+        }
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('INGEST_QUEUE_PATH', os.path.join(app.instance_path, 'pop_order_queue.db'))
+        app.config.setdefault('INGEST_BATCH_SIZE', 200)
+        app.config.setdefault('INGEST_FLUSH_INTERVAL', 0.5)
+        app.config.setdefault('INGEST_BACKGROUND_FLUSH', True)
+        app.config.setdefault('IDEMPOTENCY_CACHE_SIZE', 10000)
+        app.config.setdefault('IDEMPOTENCY_TTL', 24 * 60 * 60)
+
+        os.makedirs(os.path.dirname(app.config['INGEST_QUEUE_PATH']), exist_ok=True)
+        self.app = app
+        self.batch_size = app.config['INGEST_BATCH_SIZE']
+        self.flush_interval = app.config['INGEST_FLUSH_INTERVAL']
+        self.queue = OrderQueue(app.config['INGEST_QUEUE_PATH'])
+        self.idempotency_ttl = app.config['IDEMPOTENCY_TTL']
+        self.recent = ResponseCache(app.config['IDEMPOTENCY_CACHE_SIZE'], self.idempotency_ttl)
+        self._next_key_expiry = 0.0
+        # Anything left over from a previous run is flushed on the first tick.
+        self._pending = self.queue.depth()
+        app.extensions['ingest'] = self
+
+    def start(self):
+        """Start the background flusher unless ``INGEST_BACKGROUND_FLUSH`` is off."""
+        if not self.app.config['INGEST_BACKGROUND_FLUSH'] or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='pop-order-flusher', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def submit(self, order, key=None):
+        """Durably queue a validated order.
+
+        Returns ``(response, replayed)``.  A key that was already accepted
+        yields the original response and queues nothing.
+        """
+        key = 'key:' + key if key else order_fingerprint(order)
+        response = self.recent.get(key)
+        if response is not None:
+            with self._cond:
+                self.counters['replays'] += 1
+            return response, True
+
+        # The receipt is only a handle for support to find the order in the
+        # logs or dead-letter table; queue sequences restart with the file.
+        receipt = uuid.uuid4().hex
+        response, replayed = self.queue.append(
+            dict(order, receipt=receipt), datetime.utcnow(), key,
+            {"success": True, "message": "Order received", "order_id": receipt},
+        )
+        self.recent.put(key, response)
+        with self._cond:
+            if replayed:
+                self.counters['replays'] += 1
+                return response, True
+            self._pending += 1
+            self.counters['orders_queued'] += 1
+            if self._pending >= self.batch_size:
+                self._cond.notify()
+        return response, False
+
+    def _run(self):
+        while not self._stopping.is_set():
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._pending >= self.batch_size or self._stopping.is_set(),
+                    timeout=self.flush_interval,
+                )
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("P.O.P. order flush failed; will retry")
+                self._stopping.wait(self.flush_interval)
+
+    def stop(self):
+        self._stopping.set()
+        with self._cond:
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Final P.O.P. order flush failed; orders remain queued")
+
+    def flush(self):
+        """Drain the queue in batches. Returns the number of orders applied."""
+        applied = 0
+        with self._flush_lock:
+            if time.monotonic() >= self._next_key_expiry:
+                self.queue.expire_keys(datetime.utcnow() - timedelta(seconds=self.idempotency_ttl))
+                self._next_key_expiry = time.monotonic() + 60
+            while True:
+                entries = self.queue.peek(self.batch_size)
+                if not entries:
+                    break
+                started = time.perf_counter()
+                with self.app.app_context():
+                    try:
+                        last_seq, orders, rows = self._apply(entries)
+                    except OperationalError:
+                        # Locked or unreachable database: keep everything queued.
+                        db.session.rollback()
+                        self.counters['flush_failures'] += 1
+                        raise
+                    except Exception:
+                        db.session.rollback()
+                        self.counters['flush_failures'] += 1
+                        logger.exception("P.O.P. order batch failed; applying its orders one at a time")
+                        last_seq, orders, rows = self._apply_each(entries)
+                if last_seq is None:
+                    continue
+                self.queue.trim(last_seq)
+                self._record(len(entries), orders, rows, time.perf_counter() - started)
+                applied += orders
+                if len(entries) < self.batch_size:
+                    break
+        return applied
+
+    def _checkpoint(self):
+        name = self.queue.checkpoint_name
+        checkpoint = db.session.get(IngestCheckpoint, name)
+        if checkpoint is None:
+            db.session.add(IngestCheckpoint(name=name, last_seq=0))
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # Another worker's flusher created it first.
+                db.session.rollback()
+            checkpoint = db.session.get(IngestCheckpoint, name)
+        return checkpoint.last_seq
+
+    def _claim(self, previous, last_seq):
+        """Advance the checkpoint from ``previous``; False if another flusher moved it."""
+        # Every gunicorn worker runs a flusher against the same queue file.
+        # Advancing the checkpoint only from the value read beforehand takes
+        # the write lock (SQLite) or row lock (Postgres) before anything is
+        # inserted; if another flusher moved it meanwhile, nothing matches and
+        # the batch is re-read from the queue.
+        claimed = db.session.execute(
+            update(IngestCheckpoint)
+            .where(IngestCheckpoint.name == self.queue.checkpoint_name, IngestCheckpoint.last_seq == previous)
+            .values(last_seq=last_seq)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not claimed:
+            db.session.rollback()
+        return bool(claimed)
+
+    def _apply_each(self, entries):
+        """Apply a failed batch one order at a time, dead-lettering orders that still fail."""
+        last_seq, orders, rows = None, 0, 0
+        for entry in entries:
+            try:
+                seq, applied, written = self._apply([entry])
+            except OperationalError:
+                db.session.rollback()
+                raise
+            except Exception as e:
+                db.session.rollback()
+                seq, applied, written = self._dead_letter(entry, e), 0, 0
+            if seq is None:
+                break
+            last_seq, orders, rows = seq, orders + applied, rows + written
+        return last_seq, orders, rows
+
+    def _dead_letter(self, entry, error):
+        seq, order, received_at = entry
+        previous = self._checkpoint()
+        if seq <= previous:
+            db.session.rollback()
+            return seq
+        if not self._claim(previous, seq):
+            return None
+        db.session.add(IngestDeadLetter(
+            queue_seq=seq,
+            payload=json.dumps(order),
+            received_at=received_at,
+            error=f'{type(error).__name__}: {error}',
+        ))
+        db.session.commit()
+        logger.error("Moved queued P.O.P. order %s (receipt %s, PO %r) to ingest_dead_letter: %s",
+                     seq, order.get('receipt'), order.get('po_number'), error)
+        with self._cond:
+            self.counters['orders_dead_lettered'] += 1
+        return seq
+
+    def _apply(self, entries):
+        """Apply one batch; returns ``(None, 0, 0)`` if another flusher got there first."""
+        previous = self._checkpoint()
+        fresh = [entry for entry in entries if entry[0] > previous]
+        last_seq = max(entry[0] for entry in entries)
+        if len(fresh) < len(entries):
+            # Expected only after a crash between commit and trim, or when
+            # another worker's flusher won the race; anything else means the
+            # checkpoint does not belong to this queue file.
+            stale = [entry for entry in entries if entry[0] <= previous]
+            logger.warning(
+                "Discarding %d queued P.O.P. orders (seq %d-%d, receipts %s) at or below "
+                "checkpoint %s=%d as already applied",
+                len(stale), stale[0][0], stale[-1][0],
+                ', '.join(str(order.get('receipt')) for _, order, _ in stale),
+                self.queue.checkpoint_name, previous,
+            )
+            with self._cond:
+                self.counters['orders_discarded'] += len(stale)
+        if not fresh:
+            db.session.rollback()
+            return last_seq, 0, 0
+
+        if not self._claim(previous, last_seq):
+            return None, 0, 0
+
+        po_numbers = {order['po_number'] for _, order, _ in fresh}
+        customers = {
+            c.po_number: c
+            for c in Customer.query.filter(Customer.po_number.in_(po_numbers))
+        }
+        item_ids = {line['item_id'] for _, order, _ in fresh for line in order['items']}
+        known_items = {
+            item_id for (item_id,) in
+            db.session.query(PopItem.id).filter(PopItem.id.in_(item_ids))
+        }
+
+        for _, order, _ in fresh:
+            if order['po_number'] not in customers:
+                customer = Customer(
+                    po_number=order['po_number'],
+                    store_name=order['store_name'],
+                    email=order['email'],
+                    rep=order['rep'],
+                )
+                db.session.add(customer)
+                customers[order['po_number']] = customer
+        db.session.flush()
+
+        rows = []
+        for seq, order, received_at in fresh:
+            customer_id = customers[order['po_number']].id
+            for line in order['items']:
+                if line['item_id'] not in known_items:
+                    logger.warning("Dropping unknown P.O.P. item %s from queued order %s",
+                                   line['item_id'], seq)
+                    continue
+                rows.append({
+                    'customer_id': customer_id,
+                    'item_id': line['item_id'],
+                    'quantity': line['quantity'],
+                    'note': order['note'],
+                    'status': 'Pending',
+                    'timestamp': received_at,
+                })
+        if rows:
+            db.session.execute(insert(PopOrder), rows)
+        db.session.commit()
+        return last_seq, len(fresh), len(rows)
+
+    def _record(self, batch_size, orders, rows, seconds):
+        with self._cond:
+            self._pending = max(0, self._pending - batch_size)
+            c = self.counters
+            c['orders_flushed'] += orders
+            c['rows_written'] += rows
+            c['batches_flushed'] += 1
+            c['last_batch_size'] = batch_size
+            c['max_batch_size'] = max(c['max_batch_size'], batch_size)
+            c['last_flush_seconds'] = seconds
+            c['max_flush_seconds'] = max(c['max_flush_seconds'], seconds)
+            c['total_flush_seconds'] += seconds
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self.counters)
+        stats['queue_depth'] = self.queue.depth()
+        batches = stats['batches_flushed']
+        stats['avg_flush_seconds'] = stats['total_flush_seconds'] / batches if batches else 0.0
+        stats['avg_batch_size'] = stats['orders_flushed'] / batches if batches else 0.0
+        return stats
+
+
+pipeline = IngestPipeline()
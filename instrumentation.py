@@ -0,0 +1,219 @@
+"""Request, SQL and template timing exposed in Prometheus text format.
+
+When ``METRICS_ENABLED`` is on, every request records its latency per
+endpoint, the number and duration of SQL statements it ran (from SQLAlchemy
+engine events) and template render time.  Requests slower than
+``SLOW_REQUEST_SECONDS`` are logged with their slowest statements.  Timing
+ends when the response is closed, so streamed exports are measured in full.
+
+``/metrics`` answers a signed-in admin, or a scraper sending
+``Authorization: Bearer <METRICS_TOKEN>``.  With ``METRICS_ENABLED`` off no
+hooks are installed at all.  Figures are per
+process: with several gunicorn workers each scrape sees the worker that
+answered it, so compare rates rather than absolute totals.
+"""
+import heapq
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from flask import before_render_template, request, template_rendered
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Histogram:
+    """Thread-safe Prometheus histogram keyed by a tuple of label values."""
+
+    def __init__(self, name, description, label_names, buckets):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((labels, [list(s[0]), s[1], s[2]]) for labels, s in self._series.items())
+        for labels, (counts, total, count) in series:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = _labels(self.label_names, labels, f'le="{bound}"')
+                lines.append(f'{self.name}_bucket{le} {cumulative}')
+            le = _labels(self.label_names, labels, 'le="+Inf"')
+            lines.append(f'{self.name}_bucket{le} {count}')
+            lines.append(f'{self.name}_sum{_labels(self.label_names, labels)} {total}')
+            lines.append(f'{self.name}_count{_labels(self.label_names, labels)} {count}')
+        return lines
+
+
+class Instrumentation:
+    def __init__(self):
+        self.enabled = False
+        self.slow_seconds = 1.0
+        self.slow_queries = 5
+        self._local = threading.local()
+        self.requests = Histogram(
+            'crm_http_request_duration_seconds', 'Request latency, including streamed bodies.',
+            ('endpoint', 'method', 'status'), LATENCY_BUCKETS)
+        self.request_queries = Histogram(
+            'crm_http_request_queries', 'SQL statements executed per request.',
+            ('endpoint',), COUNT_BUCKETS)
+        self.queries = Histogram(
+            'crm_db_query_duration_seconds', 'SQL statement latency by calling endpoint.',
+            ('endpoint',), QUERY_BUCKETS)
+        self.templates = Histogram(
+            'crm_template_render_seconds', 'Template render time.',
+            ('template',), LATENCY_BUCKETS)
+        self.slow_requests = 0
+        self._slow_lock = threading.Lock()
+
+    def init_app(self, app, db):
+        app.config.setdefault('METRICS_ENABLED', os.environ.get('METRICS_ENABLED', '1') == '1')
+        app.config.setdefault('METRICS_TOKEN', os.environ.get('METRICS_TOKEN'))
+        app.config.setdefault('SLOW_REQUEST_SECONDS', 1.0)
+        app.config.setdefault('SLOW_REQUEST_QUERIES', 5)
+        if not app.config['METRICS_ENABLED']:
+            return
+        self.enabled = True
+        self.slow_seconds = app.config['SLOW_REQUEST_SECONDS']
+        self.slow_queries = app.config['SLOW_REQUEST_QUERIES']
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self._before_execute)
+            event.listen(db.engine, 'after_cursor_execute', self._after_execute)
+            event.listen(db.engine, 'handle_error', self._on_error)
+
+    # Requests
+
+    def _before_request(self):
+        state = self._local
+        state.started = time.perf_counter()
+        state.endpoint = request.endpoint or '<unmatched>'
+        state.query_count = 0
+        state.query_seconds = 0.0
+        state.template_seconds = 0.0
+        state.slowest = []
+
+    def _after_request(self, response):
+        state = self._local
+        if getattr(state, 'started', None) is None:
+            return response
+        method, status = request.method, response.status_code
+        path = request.full_path.rstrip('?')
+        response.call_on_close(lambda: self._finish(method, status, path))
+        return response
+
+    def _finish(self, method, status, path):
+        state = self._local
+        started, state.started = state.started, None
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        self.requests.observe((state.endpoint, method, str(status)), elapsed)
+        self.request_queries.observe((state.endpoint,), state.query_count)
+        if elapsed >= self.slow_seconds:
+            with self._slow_lock:
+                self.slow_requests += 1
+            queries = '\n'.join(
+                f'  {seconds * 1000:.1f} ms  {statement}'
+                for seconds, statement in sorted(state.slowest, reverse=True)
+            )
+            logger.warning(
+                "Slow request %s %s -> %s took %.3fs (%d queries, %.3fs SQL, %.3fs templates)%s",
+                method, path, status, elapsed, state.query_count, state.query_seconds,
+                state.template_seconds, '\n' + queries if queries else '',
+            )
+
+    # SQL
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started'].pop()
+        state = self._local
+        if getattr(state, 'started', None) is None:
+            self.queries.observe(('<background>',), elapsed)
+            return
+        self.queries.observe((state.endpoint,), elapsed)
+        state.query_count += 1
+        state.query_seconds += elapsed
+        entry = (elapsed, ' '.join(statement.split())[:500])
+        if len(state.slowest) < self.slow_queries:
+            heapq.heappush(state.slowest, entry)
+        elif self.slow_queries:
+            heapq.heappushpop(state.slowest, entry)
+
+    def _on_error(self, exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get('query_started'):
+            conn.info['query_started'].pop()
+
+    # Templates
+
+    def _before_render(self, sender, template, context, **extra):
+        self._local.render_started = time.perf_counter()
+
+    def _after_render(self, sender, template, context, **extra):
+        started = getattr(self._local, 'render_started', None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        self._local.render_started = None
+        self.templates.observe((template.name or '<string>',), elapsed)
+        if getattr(self._local, 'started', None) is not None:
+            self._local.template_seconds += elapsed
+
+    # Exposition
+
+    def render(self, gauges=None):
+        """Return the Prometheus text exposition, plus ``gauges`` as untyped samples."""
+        lines = []
+        for histogram in (self.requests, self.request_queries, self.queries, self.templates):
+            lines.extend(histogram.render())
+        lines.append('# HELP crm_slow_requests_total Requests slower than SLOW_REQUEST_SECONDS.')
+        lines.append('# TYPE crm_slow_requests_total counter')
+        lines.append(f'crm_slow_requests_total {self.slow_requests}')
+        for name, value in sorted((gauges or {}).items()):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines.append(f'# TYPE {name} untyped')
+                lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+instrumentation = Instrumentation()
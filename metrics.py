@@ -0,0 +1,213 @@
+"""Dashboard metrics and rep leaderboard served from ``dashboard_rollup``.
+
+Every flush that adds, removes or changes a contact or task applies the
+matching +/- deltas to the rollup in the same transaction, so the dashboard
+reads a few hundred pre-aggregated rows instead of scanning ``contact`` and
+``task``.  The computed dashboard is cached in-process per calendar day for
+``DASHBOARD_CACHE_TTL`` seconds; local commits drop it immediately and the
+TTL bounds staleness from other worker processes.
+"""
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+
+from sqlalchemy import case, event, func, inspect, insert, select, update
+from sqlalchemy.orm import Session
+
+from models import db, Contact, Task, DashboardRollup, DUE_SOON_DAYS
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _old(obj, attr):
+    history = inspect(obj).attrs[attr].history
+    return history.deleted[0] if history.deleted else getattr(obj, attr)
+
+
+def _task_key(task, rep, old=False):
+    due = _old(task, 'due_date') if old else task.due_date
+    status = _old(task, 'status') if old else task.status
+    column = 'completed' if status == 'completed' else 'pending'
+    return rep, due, column
+
+
+def _contact_of(session, task):
+    return task.contact if task.contact is not None else session.get(Contact, task.contact_id)
+
+
+def _collect_deltas(session, flush_context, instances):
+    deltas = Counter()
+    with session.no_autoflush:
+        for obj in session.new:
+            if isinstance(obj, Task):
+                deltas[_task_key(obj, _contact_of(session, obj).rep)] += 1
+            elif isinstance(obj, Contact) and not obj.archived:
+                deltas[(obj.rep, None, 'contacts')] += 1
+
+        for obj in session.deleted:
+            if isinstance(obj, Task):
+                contact = _contact_of(session, obj)
+                deltas[_task_key(obj, _old(contact, 'rep'), old=True)] -= 1
+            elif isinstance(obj, Contact) and not _old(obj, 'archived'):
+                deltas[(_old(obj, 'rep'), None, 'contacts')] -= 1
+
+        touched = set(session.new) | set(session.deleted)
+        for obj in session.dirty:
+            if isinstance(obj, Task) and session.is_modified(obj):
+                contact = _contact_of(session, obj)
+                deltas[_task_key(obj, _old(contact, 'rep'), old=True)] -= 1
+                deltas[_task_key(obj, contact.rep)] += 1
+                touched.add(obj)
+        for obj in session.dirty:
+            if not isinstance(obj, Contact) or not session.is_modified(obj):
+                continue
+            old_rep, old_archived = _old(obj, 'rep'), _old(obj, 'archived')
+            deltas[(old_rep, None, 'contacts')] -= 0 if old_archived else 1
+            deltas[(obj.rep, None, 'contacts')] += 0 if obj.archived else 1
+            if old_rep != obj.rep:
+                for task in obj.tasks:
+                    if task not in touched:
+                        deltas[_task_key(task, old_rep)] -= 1
+                        deltas[_task_key(task, obj.rep)] += 1
+
+    deltas = {key: n for key, n in deltas.items() if n}
+    if deltas:
+        session.info.setdefault('rollup_deltas', Counter()).update(deltas)
+
+
+def _apply_deltas(session, flush_context):
+    deltas = session.info.pop('rollup_deltas', None)
+    if not deltas:
+        return
+    for (rep, day, column), n in deltas.items():
+        if n:
+            bump(session, rep, day, **{column: n})
+    session.info['rollup_dirty'] = True
+
+
+def bump(session, rep, day, contacts=0, pending=0, completed=0):
+    """Add deltas to the rollup row for ``(rep, day)``, creating it if needed."""
+    table = DashboardRollup.__table__
+    result = session.execute(
+        update(table)
+        .where(table.c.rep.is_not_distinct_from(rep), table.c.day.is_not_distinct_from(day))
+        .values(
+            contacts=table.c.contacts + contacts,
+            pending=table.c.pending + pending,
+            completed=table.c.completed + completed,
+        )
+    )
+    if result.rowcount == 0:
+        session.execute(insert(table).values(
+            rep=rep, day=day, contacts=contacts, pending=pending, completed=completed))
+
+
+def _after_commit(session):
+    if session.info.pop('rollup_dirty', False):
+        invalidate()
+
+
+def _after_rollback(session):
+    session.info.pop('rollup_deltas', None)
+    session.info.pop('rollup_dirty', None)
+
+
+# The deltas need each changed attribute's previous value.  Setting an
+# attribute on an expired object (anything not reloaded since the last
+# commit) records no old value unless active history loads it first.
+for _attribute in (Contact.rep, Contact.archived, Task.status, Task.due_date):
+    event.listen(_attribute, 'set', lambda target, value, oldvalue, initiator: None, active_history=True)
+
+event.listen(Session, 'before_flush', _collect_deltas)
+event.listen(Session, 'after_flush', _apply_deltas)
+event.listen(Session, 'after_commit', _after_commit)
+event.listen(Session, 'after_soft_rollback', lambda session, previous: _after_rollback(session))
+
+
+def rebuild():
+    """Recompute the whole rollup from ``contact`` and ``task``."""
+    counts = Counter()
+    for rep, n in db.session.execute(
+        select(Contact.rep, func.count()).where(Contact.archived.isnot(True)).group_by(Contact.rep)
+    ):
+        counts[(rep, None, 'contacts')] += n
+    for rep, due, status, n in db.session.execute(
+        select(Contact.rep, Task.due_date, Task.status, func.count())
+        .join(Contact, Task.contact_id == Contact.id)
+        .group_by(Contact.rep, Task.due_date, Task.status)
+    ):
+        column = 'completed' if status == 'completed' else 'pending'
+        counts[(rep, due, column)] += n
+
+    rows = {}
+    for (rep, day, column), n in counts.items():
+        row = rows.setdefault((rep, day), {'rep': rep, 'day': day, 'contacts': 0, 'pending': 0, 'completed': 0})
+        row[column] += n
+    db.session.execute(DashboardRollup.__table__.delete())
+    if rows:
+        db.session.execute(insert(DashboardRollup), list(rows.values()))
+    db.session.commit()
+    invalidate()
+
+
+def ensure_rollup():
+    """Build the rollup on first start against an existing database."""
+    if db.session.query(DashboardRollup.id).first() is None and (
+            db.session.query(Contact.id).first() is not None):
+        rebuild()
+
+
+def invalidate():
+    with _cache_lock:
+        _cache.clear()
+
+
+def _compute(today):
+    r = DashboardRollup
+    soon = today + timedelta(days=DUE_SOON_DAYS)
+    rows = db.session.execute(
+        select(
+            r.rep,
+            func.sum(r.contacts),
+            func.sum(r.completed),
+            func.sum(case((r.day < today, r.pending), else_=0)),
+            func.sum(case((r.day == today, r.pending), else_=0)),
+            func.sum(case(((r.day > today) & (r.day <= soon), r.pending), else_=0)),
+        ).group_by(r.rep)
+    ).all()
+
+    metrics = {'total_contacts': 0, 'tasks_due_today': 0, 'tasks_due_soon': 0, 'overdue': 0}
+    leaderboard = []
+    for rep, contacts, completed, overdue, due_today, due_soon in rows:
+        contacts, completed, overdue = contacts or 0, completed or 0, overdue or 0
+        metrics['total_contacts'] += contacts
+        metrics['overdue'] += overdue
+        metrics['tasks_due_today'] += due_today or 0
+        metrics['tasks_due_soon'] += due_soon or 0
+        if rep and (contacts or completed or overdue):
+            leaderboard.append({
+                'rep': rep,
+                'total_contacts': contacts,
+                'completed_tasks': completed,
+                'overdue_tasks': overdue,
+            })
+    leaderboard.sort(key=lambda entry: (-entry['completed_tasks'], entry['overdue_tasks'], entry['rep']))
+    return metrics, leaderboard
+
+
+def dashboard_metrics(ttl=60):
+    """Return ``(metrics, leaderboard)`` for today, cached for ``ttl`` seconds."""
+    today = date.today()
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _cache.get(today)
+        if cached and cached[0] > now:
+            return cached[1]
+    result = _compute(today)
+    with _cache_lock:
+        # A new day makes every older entry's buckets wrong; drop them.
+        _cache.clear()
+        _cache[today] = (now + ttl, result)
+    return result
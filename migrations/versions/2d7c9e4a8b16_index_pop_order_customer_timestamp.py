@@ -0,0 +1,25 @@
+"""Index pop_order (customer_id, timestamp, id) for search pages
+
+Revision ID: 2d7c9e4a8b16
+Revises: 8f4b2d6e1c73
+Create Date: 2026-10-18 22:15:48.902137
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '2d7c9e4a8b16'
+down_revision = '8f4b2d6e1c73'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('pop_order', schema=None) as batch_op:
+        batch_op.create_index('ix_pop_order_customer_timestamp_id', ['customer_id', 'timestamp', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('pop_order', schema=None) as batch_op:
+        batch_op.drop_index('ix_pop_order_customer_timestamp_id')
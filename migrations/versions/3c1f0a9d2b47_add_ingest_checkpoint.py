@@ -0,0 +1,28 @@
+"""Add ingest checkpoint for the P.O.P. order queue
+
+Revision ID: 3c1f0a9d2b47
+Revises: f917ce8b7cc2
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1f0a9d2b47'
+down_revision = 'f917ce8b7cc2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ingest_checkpoint',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('last_seq', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('ingest_checkpoint')
@@ -0,0 +1,85 @@
+"""Index P.O.P. order search columns and add customer FTS
+
+Revision ID: 7e2b5c9a1f03
+Revises: 3c1f0a9d2b47
+Create Date: 2026-10-18 11:40:02.517930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e2b5c9a1f03'
+down_revision = '3c1f0a9d2b47'
+branch_labels = None
+depends_on = None
+
+
+def _has_fts5(bind):
+    try:
+        bind.exec_driver_sql("CREATE VIRTUAL TABLE temp._fts5_probe USING fts5(x)")
+        bind.exec_driver_sql("DROP TABLE temp._fts5_probe")
+        return True
+    except sa.exc.DBAPIError:
+        return False
+
+
+def upgrade():
+    with op.batch_alter_table('customer', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_customer_store_name'), ['store_name'], unique=False)
+        batch_op.create_index(batch_op.f('ix_customer_rep'), ['rep'], unique=False)
+
+    with op.batch_alter_table('pop_order', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_pop_order_status'), ['status'], unique=False)
+        batch_op.create_index(batch_op.f('ix_pop_order_timestamp'), ['timestamp'], unique=False)
+        batch_op.create_index(batch_op.f('ix_pop_order_customer_id'), ['customer_id'], unique=False)
+        batch_op.create_index('ix_pop_order_status_timestamp_id', ['status', 'timestamp', 'id'], unique=False)
+
+    # Free-text search over customers is optional: only SQLite builds with
+    # FTS5 get it, everything else falls back to a scan in pop_orders.py.
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite' or not _has_fts5(bind):
+        return
+    op.execute(
+        "CREATE VIRTUAL TABLE customer_fts USING fts5("
+        "store_name, po_number, rep, content='customer', content_rowid='id')"
+    )
+    op.execute("""
+        CREATE TRIGGER customer_fts_ai AFTER INSERT ON customer BEGIN
+            INSERT INTO customer_fts (rowid, store_name, po_number, rep)
+            VALUES (new.id, new.store_name, new.po_number, new.rep);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER customer_fts_ad AFTER DELETE ON customer BEGIN
+            INSERT INTO customer_fts (customer_fts, rowid, store_name, po_number, rep)
+            VALUES ('delete', old.id, old.store_name, old.po_number, old.rep);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER customer_fts_au AFTER UPDATE ON customer BEGIN
+            INSERT INTO customer_fts (customer_fts, rowid, store_name, po_number, rep)
+            VALUES ('delete', old.id, old.store_name, old.po_number, old.rep);
+            INSERT INTO customer_fts (rowid, store_name, po_number, rep)
+            VALUES (new.id, new.store_name, new.po_number, new.rep);
+        END
+    """)
+    op.execute("INSERT INTO customer_fts (customer_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS customer_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS customer_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS customer_fts_ai")
+    op.execute("DROP TABLE IF EXISTS customer_fts")
+
+    with op.batch_alter_table('pop_order', schema=None) as batch_op:
+        batch_op.drop_index('ix_pop_order_status_timestamp_id')
+        batch_op.drop_index(batch_op.f('ix_pop_order_customer_id'))
+        batch_op.drop_index(batch_op.f('ix_pop_order_timestamp'))
+        batch_op.drop_index(batch_op.f('ix_pop_order_status'))
+
+    with op.batch_alter_table('customer', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_customer_rep'))
+        batch_op.drop_index(batch_op.f('ix_customer_store_name'))
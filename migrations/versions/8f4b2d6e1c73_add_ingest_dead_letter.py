@@ -0,0 +1,32 @@
+"""Add ingest_dead_letter for queued orders that cannot be applied
+
+Revision ID: 8f4b2d6e1c73
+Revises: 5b3e8f0c6a92
+Create Date: 2026-10-18 21:40:12.306581
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8f4b2d6e1c73'
+down_revision = '5b3e8f0c6a92'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ingest_dead_letter',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('queue_seq', sa.Integer(), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('received_at', sa.DateTime(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('ingest_dead_letter')
@@ -0,0 +1,27 @@
+"""Add pop_item.updated_at for catalog Last-Modified
+
+Revision ID: a4d9e2c7b815
+Revises: e91c3d7a5f20
+Create Date: 2026-10-18 18:12:09.417236
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4d9e2c7b815'
+down_revision = 'e91c3d7a5f20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('pop_item', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.execute('UPDATE pop_item SET updated_at = CURRENT_TIMESTAMP')
+
+
+def downgrade():
+    with op.batch_alter_table('pop_item', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
@@ -0,0 +1,40 @@
+"""Add dashboard rollup
+
+Revision ID: b84d06e3c2a9
+Revises: 7e2b5c9a1f03
+Create Date: 2026-10-18 13:05:27.644812
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b84d06e3c2a9'
+down_revision = '7e2b5c9a1f03'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The app fills this table from contact/task on first start.
+    op.create_table('dashboard_rollup',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('rep', sa.String(length=120), nullable=True),
+    sa.Column('day', sa.Date(), nullable=True),
+    sa.Column('contacts', sa.Integer(), nullable=False),
+    sa.Column('pending', sa.Integer(), nullable=False),
+    sa.Column('completed', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('dashboard_rollup', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_dashboard_rollup_day'), ['day'], unique=False)
+        batch_op.create_index(batch_op.f('ix_dashboard_rollup_rep'), ['rep'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('dashboard_rollup', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_dashboard_rollup_rep'))
+        batch_op.drop_index(batch_op.f('ix_dashboard_rollup_day'))
+
+    op.drop_table('dashboard_rollup')
@@ -0,0 +1,126 @@
+"""Convert task/pop/order date strings to DATE columns
+
+Revision ID: c5a7e19f4d2b
+Revises: b84d06e3c2a9
+Create Date: 2026-10-18 14:22:51.903117
+
+"""
+import logging
+import time
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5a7e19f4d2b'
+down_revision = 'b84d06e3c2a9'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+DATE_COLUMNS = (
+    ('task', 'due_date'),
+    ('pop', 'sent_date'),
+    ('order', 'order_date'),
+)
+CHUNK_SIZE = 5000
+PAUSE_SECONDS = 0.05
+FORMATS = ('%Y-%m-%d', '%m/%d/%Y', '%m/%d/%y', '%Y/%m/%d', '%d %b %Y', '%b %d, %Y')
+
+
+def _normalise(value):
+    value = (value or '').strip()
+    if not value:
+        return None
+    for fmt in FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date().isoformat()
+        except ValueError:
+            pass
+    try:
+        # Timestamps such as '2025-04-18 10:00:00' or ISO strings with a time part.
+        return datetime.fromisoformat(value).date().isoformat()
+    except ValueError:
+        return None
+
+
+def _backfill(bind, table, column):
+    """Rewrite every value as YYYY-MM-DD (or NULL) in short transactions.
+
+    Each chunk commits on its own and the loop sleeps briefly between
+    chunks, so the app keeps reading and writing while a large table is
+    converted instead of waiting on one long write lock.
+    """
+    t = sa.table(table, sa.column('id', sa.Integer), sa.column(column, sa.String))
+    select = (
+        sa.select(t.c.id, t.c[column])
+        .where(t.c.id > sa.bindparam('last_id'), t.c[column].isnot(None))
+        .order_by(t.c.id)
+        .limit(CHUNK_SIZE)
+    )
+    update = t.update().where(t.c.id == sa.bindparam('row_id')).values({column: sa.bindparam('value')})
+    last_id, unparsed = 0, 0
+    while True:
+        rows = bind.execute(select, {'last_id': last_id}).all()
+        if not rows:
+            break
+        changes = []
+        for row_id, value in rows:
+            normalised = _normalise(value)
+            unparsed += normalised is None and bool((value or '').strip())
+            if normalised != value:
+                changes.append({'row_id': row_id, 'value': normalised})
+        if changes:
+            bind.exec_driver_sql('BEGIN')
+            bind.execute(update, changes)
+            bind.exec_driver_sql('COMMIT')
+        last_id = rows[-1][0]
+        time.sleep(PAUSE_SECONDS)
+    if unparsed:
+        logger.warning("%s.%s: %d unparseable value(s) set to NULL", table, column, unparsed)
+
+
+def _convert_sqlite(table, column):
+    # A batch ALTER of the type would copy rows through CAST(x AS DATE),
+    # which SQLite turns into a number; copy the normalised text verbatim.
+    temp = f'{column}_new'
+    with op.batch_alter_table(table, schema=None) as batch_op:
+        batch_op.add_column(sa.Column(temp, sa.Date(), nullable=True))
+    t = sa.table(table, sa.column(column), sa.column(temp))
+    op.execute(t.update().values({temp: t.c[column]}))
+    with op.batch_alter_table(table, schema=None) as batch_op:
+        batch_op.drop_column(column)
+        batch_op.alter_column(temp, new_column_name=column)
+    op.create_index(op.f(f'ix_{table}_{column}'), table, [column], unique=False)
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        for table, column in DATE_COLUMNS:
+            _backfill(bind, table, column)
+
+    for table, column in DATE_COLUMNS:
+        if op.get_bind().dialect.name == 'sqlite':
+            _convert_sqlite(table, column)
+            continue
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column(column,
+                   existing_type=sa.String(length=120),
+                   type_=sa.Date(),
+                   existing_nullable=True,
+                   postgresql_using=f'{column}::date')
+            batch_op.create_index(batch_op.f(f'ix_{table}_{column}'), [column], unique=False)
+
+
+def downgrade():
+    for table, column in DATE_COLUMNS:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(batch_op.f(f'ix_{table}_{column}'))
+            batch_op.alter_column(column,
+                   existing_type=sa.Date(),
+                   type_=sa.String(length=120),
+                   existing_nullable=True)
@@ -0,0 +1,31 @@
+"""Index contact grid filters and task.contact_id
+
+Revision ID: d2f8a4b61e57
+Revises: c5a7e19f4d2b
+Create Date: 2026-10-18 15:48:13.270561
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2f8a4b61e57'
+down_revision = 'c5a7e19f4d2b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('contact', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_contact_rep'), ['rep'], unique=False)
+
+    with op.batch_alter_table('task', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_task_contact_id'), ['contact_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('task', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_task_contact_id'))
+
+    with op.batch_alter_table('contact', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_contact_rep'))
@@ -0,0 +1,24 @@
+"""Index lower(contact.email) for import dedup
+
+Revision ID: e91c3d7a5f20
+Revises: d2f8a4b61e57
+Create Date: 2026-10-18 17:31:44.082915
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e91c3d7a5f20'
+down_revision = 'd2f8a4b61e57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_contact_email_lower', 'contact', [sa.text('lower(email)')], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_contact_email_lower', table_name='contact')
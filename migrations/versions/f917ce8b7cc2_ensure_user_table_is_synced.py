@@ -17,12 +17,16 @@ depends_on = None
 
 
 def upgrade():
-    # ### commands auto generated by Alembic - please adjust! ###
+    # The shipped crm.db is stamped 06a1bc2df475 but its user table was
+    # already rebuilt with password_hash, so only make the changes it lacks.
+    columns = {c['name'] for c in sa.inspect(op.get_bind()).get_columns('user')}
+    if 'password_hash' in columns and 'password' not in columns:
+        return
     with op.batch_alter_table('user', schema=None) as batch_op:
-        batch_op.add_column(sa.Column('password_hash', sa.String(length=255), nullable=False))
-        batch_op.drop_column('password')
-
-    # ### end Alembic commands ###
+        if 'password_hash' not in columns:
+            batch_op.add_column(sa.Column('password_hash', sa.String(length=255), nullable=False))
+        if 'password' in columns:
+            batch_op.drop_column('password')
 
 
 def downgrade():
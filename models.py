@@ -0,0 +1,222 @@
+from datetime import date, datetime, timedelta
+import uuid
+
+from flask_login import UserMixin
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import and_, event, func
+from sqlalchemy.orm import Session
+from werkzeug.security import check_password_hash, generate_password_hash
+
+db = SQLAlchemy()
+
+
+def invalidate_on_commit(model, callback):
+    """Call ``callback()`` after each commit that added, changed or deleted a ``model``.
+
+    Rows are noted as they are flushed and the callback only runs once the
+    transaction commits, so a rolled-back change never empties a cache.
+    """
+    flag = object()
+
+    def mark_dirty(session, flush_context, instances):
+        for obj in (*session.new, *session.dirty, *session.deleted):
+            if isinstance(obj, model):
+                session.info[flag] = True
+                return
+
+    def after_commit(session):
+        if session.info.pop(flag, False):
+            callback()
+
+    event.listen(Session, 'before_flush', mark_dirty)
+    event.listen(Session, 'after_commit', after_commit)
+    event.listen(Session, 'after_soft_rollback', lambda session, previous: session.info.pop(flag, None))
+
+
+class User(UserMixin, db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(80), unique=True, nullable=False)
+    password_hash = db.Column(db.String(128))
+    role = db.Column(db.String(20))
+    rep_notes = db.Column(db.Text)
+
+    def set_password(self, password):
+        self.password_hash = generate_password_hash(password)
+
+    def check_password(self, password):
+        return bool(self.password_hash) and check_password_hash(self.password_hash, password)
+
+
+class Contact(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120))
+    email = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    tags = db.Column(db.String(250))
+    notes = db.Column(db.Text)
+    rep = db.Column(db.String(120), index=True)
+    archived = db.Column(db.Boolean, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Bulk import dedups on the normalised address through this index.
+    __table_args__ = (db.Index('ix_contact_email_lower', func.lower(email)),)
+
+    tasks = db.relationship('Task', backref='contact', lazy=True, cascade='all, delete-orphan')
+    contact_notes = db.relationship('Note', backref='contact', lazy=True, cascade='all, delete-orphan')
+    pops = db.relationship('Pop', backref='contact', lazy=True, cascade='all, delete-orphan')
+    orders = db.relationship('Order', backref='contact', lazy=True, cascade='all, delete-orphan')
+
+
+def parse_date(value):
+    """Parse a ``YYYY-MM-DD`` form value, returning None if blank or malformed."""
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.strptime((value or '').strip(), '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+DUE_SOON_DAYS = 3
+
+
+class Task(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    contact_id = db.Column(db.Integer, db.ForeignKey('contact.id'), nullable=False, index=True)
+    title = db.Column('task', db.String(255))
+    due_date = db.Column(db.Date, index=True)
+    status = db.Column(db.String(50), default='pending')
+
+    @property
+    def urgency(self):
+        """CSS bucket for the dashboard: overdue, due_today, due_soon or ''."""
+        if self.status == 'completed' or self.due_date is None:
+            return ''
+        today = date.today()
+        if self.due_date < today:
+            return 'overdue'
+        if self.due_date == today:
+            return 'due_today'
+        if self.due_date <= today + timedelta(days=DUE_SOON_DAYS):
+            return 'due_soon'
+        return ''
+
+    @classmethod
+    def bucket_criteria(cls, bucket, today):
+        """Index-friendly range predicate for pending tasks in ``bucket``."""
+        soon = today + timedelta(days=DUE_SOON_DAYS)
+        ranges = {
+            'overdue': cls.due_date < today,
+            'due_today': cls.due_date == today,
+            'due_soon': and_(cls.due_date > today, cls.due_date <= soon),
+        }
+        return and_(ranges[bucket], cls.status != 'completed')
+
+
+class Note(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    contact_id = db.Column(db.Integer, db.ForeignKey('contact.id'), nullable=False)
+    note = db.Column(db.Text)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class Pop(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    contact_id = db.Column(db.Integer, db.ForeignKey('contact.id'), nullable=False)
+    material = db.Column(db.String(120))
+    sent_date = db.Column(db.Date, index=True)
+
+
+class Order(db.Model):
+    __tablename__ = 'order'
+    id = db.Column(db.Integer, primary_key=True)
+    contact_id = db.Column(db.Integer, db.ForeignKey('contact.id'), nullable=False)
+    order_date = db.Column(db.Date, index=True)
+
+
+class Customer(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    po_number = db.Column(db.String(50), unique=True)
+    store_name = db.Column(db.String(100), index=True)
+    email = db.Column(db.String(120))
+    account_number = db.Column(db.String(36), unique=True, default=lambda: str(uuid.uuid4()))
+    rep = db.Column(db.String(50), index=True)
+
+    orders = db.relationship('PopOrder', backref='customer', lazy=True)
+
+
+class PopItem(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100))
+    description = db.Column(db.Text)
+    image_url = db.Column(db.String(300))
+    fee = db.Column(db.Boolean, default=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class PopOrder(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), index=True)
+    item_id = db.Column(db.Integer, db.ForeignKey('pop_item.id'))
+    quantity = db.Column(db.Integer)
+    note = db.Column(db.Text)
+    status = db.Column(db.String(20), default='Pending', index=True)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    item = db.relationship('PopItem')
+
+    # Status-filtered admin pages walk these in keyset order; search pages
+    # seek each matching customer's newest orders on the second.
+    __table_args__ = (
+        db.Index('ix_pop_order_status_timestamp_id', 'status', 'timestamp', 'id'),
+        db.Index('ix_pop_order_customer_timestamp_id', 'customer_id', 'timestamp', 'id'),
+    )
+
+
+class DashboardRollup(db.Model):
+    """Per-rep, per-due-day counters behind the dashboard and leaderboard.
+
+    Contacts are counted on rows with ``day`` NULL; task rows carry the
+    task's due day (NULL when it has none).  Rows for the same key may be
+    duplicated by concurrent writers, so readers always SUM.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    rep = db.Column(db.String(120), index=True)
+    day = db.Column(db.Date, index=True)
+    contacts = db.Column(db.Integer, nullable=False, default=0)
+    pending = db.Column(db.Integer, nullable=False, default=0)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+
+
+class IngestCheckpoint(db.Model):
+    """Highest write-ahead queue sequence already applied to pop_order."""
+    name = db.Column(db.String(50), primary_key=True)
+    last_seq = db.Column(db.Integer, nullable=False, default=0)
+
+
+class IngestDeadLetter(db.Model):
+    """Queued P.O.P. order that could not be applied, kept with the error for review."""
+    id = db.Column(db.Integer, primary_key=True)
+    queue_seq = db.Column(db.Integer, nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    received_at = db.Column(db.DateTime)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class OutboxMessage(db.Model):
+    """Notification written in the same transaction as the change behind it.
+
+    ``next_attempt_at`` is NULL once a message is delivered or given up on,
+    so the due-work scan only ever touches undelivered rows.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    topic = db.Column(db.String(50), nullable=False)
+    recipient = db.Column(db.String(120), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    claimed_by = db.Column(db.String(32), index=True)
+    sent_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
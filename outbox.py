@@ -0,0 +1,350 @@
+"""Transactional outbox for P.O.P. order status notifications.
+
+Any flush that changes ``pop_order.status`` also adds ``outbox_message``
+rows (one per recipient: the customer's email and, when
+``REP_NOTIFY_EMAILS`` maps the rep to an address, the rep) in the same
+transaction, so a status change and its notification commit or roll back
+together and the admin's request never waits on SMTP.
+
+A small pool of worker threads claims due messages in batches, sends one
+digest email per recipient per batch and retries failures with exponential
+backoff until ``OUTBOX_MAX_ATTEMPTS``.  Claims are taken with a conditional
+UPDATE that moves ``next_attempt_at`` past a lease, so several gunicorn
+workers can drain the same table without sending twice, and a worker that
+dies mid-batch only delays its messages by the lease.
+
+SMTP settings, ``OUTBOX_FROM`` and ``REP_NOTIFY_EMAILS`` are read from
+environment variables of the same name unless passed to ``create_app``.
+For local testing, ``python bench/smtp_sink.py`` listens on the default
+``localhost:1025`` and prints what it receives.
+"""
+import atexit
+import json
+import logging
+import os
+import random
+import smtplib
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, func, insert, inspect, select, update
+from sqlalchemy.orm import Session
+
+from models import db, Customer, OutboxMessage, PopItem, PopOrder
+
+logger = logging.getLogger(__name__)
+
+TOPIC_ORDER_STATUS = 'order_status'
+
+
+def status_message_rows(order_id, customer, item_name, quantity, old_status, new_status,
+                        rep_addresses, now=None):
+    """Outbox rows (as dicts) announcing one order's status change."""
+    now = now or datetime.utcnow()
+    payload = json.dumps({
+        'order_id': order_id,
+        'store_name': customer.store_name if customer else None,
+        'po_number': customer.po_number if customer else None,
+        'item': item_name,
+        'quantity': quantity,
+        'old_status': old_status,
+        'new_status': new_status,
+        'changed_at': now.isoformat(timespec='seconds'),
+    })
+    recipients = set()
+    if customer is not None and customer.email:
+        recipients.add(customer.email.strip().lower())
+    if customer is not None and rep_addresses.get(customer.rep):
+        recipients.add(rep_addresses[customer.rep])
+    return [
+        {'topic': TOPIC_ORDER_STATUS, 'recipient': recipient, 'payload': payload,
+         'created_at': now, 'attempts': 0, 'next_attempt_at': now}
+        for recipient in sorted(recipients)
+    ]
+
+
+def record_status_changes(session, changes, new_status):
+    """Queue notifications for orders moved to ``new_status`` by a bulk UPDATE.
+
+    ``changes`` maps order id -> previous status.  Core UPDATEs skip the ORM
+    flush hook below, so bulk callers use this inside their transaction.
+    """
+    ids = list(changes)
+    rows, now, rep_addresses = [], datetime.utcnow(), _rep_addresses()
+    for start in range(0, len(ids), 500):
+        for order_id, quantity, item_name, customer in session.execute(
+            select(PopOrder.id, PopOrder.quantity, PopItem.name, Customer)
+            .select_from(PopOrder)
+            .outerjoin(Customer, PopOrder.customer_id == Customer.id)
+            .outerjoin(PopItem, PopOrder.item_id == PopItem.id)
+            .where(PopOrder.id.in_(ids[start:start + 500]))
+        ):
+            rows.extend(status_message_rows(
+                order_id, customer, item_name, quantity, changes[order_id], new_status,
+                rep_addresses, now,
+            ))
+    if rows:
+        session.execute(insert(OutboxMessage), rows)
+        session.info['outbox_pending'] = True
+    return len(rows)
+
+
+def _rep_addresses():
+    return current_app.config.get('REP_NOTIFY_EMAILS', {}) if has_app_context() else {}
+
+
+def _collect(session, flush_context, instances):
+    added = False
+    with session.no_autoflush:
+        for obj in list(session.dirty):
+            if not isinstance(obj, PopOrder):
+                continue
+            history = inspect(obj).attrs.status.history
+            if not history.deleted or history.deleted[0] == obj.status:
+                continue
+            rows = status_message_rows(
+                obj.id, obj.customer, obj.item.name if obj.item else None, obj.quantity,
+                history.deleted[0], obj.status, _rep_addresses(),
+            )
+            for row in rows:
+                session.add(OutboxMessage(**row))
+                added = True
+    if added:
+        session.info['outbox_pending'] = True
+
+
+def _after_commit(session):
+    if session.info.pop('outbox_pending', False):
+        outbox.wake()
+
+
+event.listen(Session, 'before_flush', _collect)
+event.listen(Session, 'after_commit', _after_commit)
+event.listen(Session, 'after_soft_rollback', lambda session, previous: session.info.pop('outbox_pending', None))
+
+
+def build_digest(sender, recipient, payloads):
+    message = EmailMessage()
+    message['From'] = sender
+    message['To'] = recipient
+    message['Subject'] = (
+        'P.O.P. order update' if len(payloads) == 1 else f'{len(payloads)} P.O.P. order updates'
+    )
+    lines = []
+    for p in sorted(payloads, key=lambda p: (p['changed_at'], p['order_id'])):
+        lines.append(
+            f"Order #{p['order_id']} for {p['store_name']} (PO {p['po_number']}): "
+            f"{p['quantity']} x {p['item']} is now {p['new_status']} (was {p['old_status']})."
+        )
+    message.set_content('\n'.join(lines) + '\n')
+    return message
+
+
+class Outbox:
+    def __init__(self):
+        self.app = None
+        self._cond = threading.Condition()
+        self._wakeups = 0
+        self._stopping = threading.Event()
+        self._threads = []
+        self.counters = {
+            'batches': 0,
+            'emails_sent': 0,
+            'messages_delivered': 0,
+            'messages_retried': 0,
+            'messages_dead': 0,
+            'last_batch_seconds': 0.0,
+        }
+
+    def init_app(self, app):
+        app.config.setdefault('OUTBOX_WORKERS', 2)
+        app.config.setdefault('OUTBOX_BATCH_SIZE', 50)
+        app.config.setdefault('OUTBOX_POLL_INTERVAL', 5.0)
+        app.config.setdefault('OUTBOX_LEASE_SECONDS', 120)
+        app.config.setdefault('OUTBOX_MAX_ATTEMPTS', 8)
+        app.config.setdefault('OUTBOX_BACKOFF_BASE', 5)
+        app.config.setdefault('OUTBOX_BACKOFF_MAX', 60 * 60)
+        # Delivery settings come from the environment in production
+        # (wsgi.py passes no config); REP_NOTIFY_EMAILS is a JSON object.
+        env = os.environ.get
+        app.config.setdefault('OUTBOX_SMTP_HOST', env('OUTBOX_SMTP_HOST', 'localhost'))
+        app.config.setdefault('OUTBOX_SMTP_PORT', int(env('OUTBOX_SMTP_PORT', 1025)))
+        app.config.setdefault('OUTBOX_SMTP_USER', env('OUTBOX_SMTP_USER'))
+        app.config.setdefault('OUTBOX_SMTP_PASSWORD', env('OUTBOX_SMTP_PASSWORD'))
+        app.config.setdefault('OUTBOX_SMTP_STARTTLS', env('OUTBOX_SMTP_STARTTLS', '0') == '1')
+        app.config.setdefault('OUTBOX_FROM', env('OUTBOX_FROM', 'crm@localhost'))
+        app.config.setdefault('REP_NOTIFY_EMAILS', json.loads(env('REP_NOTIFY_EMAILS') or '{}'))
+
+        self.app = app
+        self.batch_size = app.config['OUTBOX_BATCH_SIZE']
+        self.poll_interval = app.config['OUTBOX_POLL_INTERVAL']
+        app.extensions['outbox'] = self
+
+    def start(self):
+        """Start ``OUTBOX_WORKERS`` delivery threads."""
+        if self._threads:
+            return
+        for n in range(self.app.config['OUTBOX_WORKERS']):
+            thread = threading.Thread(target=self._run, name=f'outbox-{n}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        if self._threads:
+            atexit.register(self.stop)
+
+    def wake(self):
+        with self._cond:
+            self._wakeups += 1
+            self._cond.notify_all()
+
+    def stop(self):
+        self._stopping.set()
+        self.wake()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    def _run(self):
+        seen = 0
+        while not self._stopping.is_set():
+            try:
+                while self.deliver() == self.batch_size and not self._stopping.is_set():
+                    pass
+            except Exception:
+                logger.exception("Outbox delivery failed; will retry")
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._wakeups != seen or self._stopping.is_set(),
+                    timeout=self.poll_interval,
+                )
+                seen = self._wakeups
+
+    def _claim(self, now):
+        config = self.app.config
+        token = uuid.uuid4().hex
+        due = db.session.scalars(
+            select(OutboxMessage.id)
+            .where(OutboxMessage.next_attempt_at <= now)
+            .order_by(OutboxMessage.next_attempt_at)
+            .limit(self.batch_size)
+        ).all()
+        if not due:
+            db.session.rollback()
+            return []
+        # Only rows still due are taken, so a concurrent claimer can't steal them.
+        db.session.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id.in_(due), OutboxMessage.next_attempt_at <= now)
+            .values(claimed_by=token,
+                    next_attempt_at=now + timedelta(seconds=config['OUTBOX_LEASE_SECONDS']))
+        )
+        db.session.commit()
+        rows = db.session.execute(
+            select(OutboxMessage.id, OutboxMessage.recipient, OutboxMessage.payload, OutboxMessage.attempts)
+            .where(OutboxMessage.claimed_by == token)
+        ).all()
+        db.session.commit()
+        return rows
+
+    def _smtp(self):
+        config = self.app.config
+        smtp = smtplib.SMTP(config['OUTBOX_SMTP_HOST'], config['OUTBOX_SMTP_PORT'], timeout=30)
+        if config['OUTBOX_SMTP_STARTTLS']:
+            smtp.starttls()
+        if config['OUTBOX_SMTP_USER']:
+            smtp.login(config['OUTBOX_SMTP_USER'], config['OUTBOX_SMTP_PASSWORD'])
+        return smtp
+
+    def _send(self, groups):
+        """Send one digest per recipient; returns ``(sent_ids, {error: [(id, attempts)]})``."""
+        sender = self.app.config['OUTBOX_FROM']
+        sent, failed = [], defaultdict(list)
+        remaining = dict(groups)
+        try:
+            with self._smtp() as smtp:
+                for recipient, rows in groups.items():
+                    payloads = [json.loads(row.payload) for row in rows]
+                    try:
+                        smtp.send_message(build_digest(sender, recipient, payloads))
+                    except smtplib.SMTPResponseException as e:
+                        # A per-message refusal; the connection is still usable.
+                        failed[f'{e.smtp_code} {e.smtp_error!r}'].extend(rows)
+                    except smtplib.SMTPRecipientsRefused as e:
+                        failed[str(e.recipients)].extend(rows)
+                    else:
+                        sent.extend(row.id for row in rows)
+                        with self._cond:
+                            self.counters['emails_sent'] += 1
+                    del remaining[recipient]
+        except (OSError, smtplib.SMTPException) as e:
+            for rows in remaining.values():
+                failed[f'{type(e).__name__}: {e}'].extend(rows)
+        return sent, failed
+
+    def deliver(self):
+        """Claim and send one batch. Returns the number of messages claimed."""
+        started = time.perf_counter()
+        config = self.app.config
+        with self.app.app_context():
+            now = datetime.utcnow()
+            rows = self._claim(now)
+            if not rows:
+                return 0
+            groups = defaultdict(list)
+            for row in rows:
+                groups[row.recipient].append(row)
+            sent, failed = self._send(groups)
+
+            now = datetime.utcnow()
+            if sent:
+                db.session.execute(
+                    update(OutboxMessage)
+                    .where(OutboxMessage.id.in_(sent))
+                    .values(sent_at=now, next_attempt_at=None, claimed_by=None,
+                            attempts=OutboxMessage.attempts + 1, last_error=None)
+                )
+            retried = dead = 0
+            for error, failures in failed.items():
+                for row in failures:
+                    attempts = row.attempts + 1
+                    if attempts >= config['OUTBOX_MAX_ATTEMPTS']:
+                        next_attempt, dead = None, dead + 1
+                    else:
+                        delay = min(config['OUTBOX_BACKOFF_MAX'], config['OUTBOX_BACKOFF_BASE'] * 2 ** row.attempts)
+                        next_attempt = now + timedelta(seconds=delay * random.uniform(0.8, 1.2))
+                        retried += 1
+                    db.session.execute(
+                        update(OutboxMessage)
+                        .where(OutboxMessage.id == row.id)
+                        .values(attempts=attempts, next_attempt_at=next_attempt, claimed_by=None,
+                                last_error=error[:1000])
+                    )
+            db.session.commit()
+        if failed:
+            logger.warning("Outbox: %d sent, %d to retry, %d given up", len(sent), retried, dead)
+        with self._cond:
+            c = self.counters
+            c['batches'] += 1
+            c['messages_delivered'] += len(sent)
+            c['messages_retried'] += retried
+            c['messages_dead'] += dead
+            c['last_batch_seconds'] = time.perf_counter() - started
+        return len(rows)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self.counters)
+        with self.app.app_context():
+            stats['pending'] = db.session.scalar(
+                select(func.count()).select_from(OutboxMessage)
+                .where(OutboxMessage.next_attempt_at.isnot(None))
+            )
+            db.session.rollback()
+        return stats
+
+
+outbox = Outbox()
@@ -0,0 +1,274 @@
+"""Query helpers for the admin P.O.P. orders view.
+
+Pages are keyset-paginated on ``(timestamp, id)`` newest first, so page N
+costs the same as page 1 regardless of how many orders exist.  Customer and
+item rows are loaded in the same query instead of per table row.  Free-text
+search matches word prefixes in a customer's store name, PO number and rep,
+through the ``customer_fts`` FTS5 table when the migration could create it
+and by scanning ``customer`` in Python otherwise.  Matching customers are
+resolved first; a search page then either seeks each customer's newest
+orders on ``(customer_id, timestamp, id)`` and merges them, or, when many
+customers match, walks the timestamp index and filters, so neither path
+sorts every matching order.
+
+Bulk status changes run one ``UPDATE ... RETURNING`` per previous status
+(at most one per entry in ``ORDER_STATUSES``) inside a single transaction.
+Each statement only matches rows still in the status the caller saw, so
+rows changed underneath are skipped rather than overwritten.
+"""
+import heapq
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, bindparam, inspect, or_, select, text, update
+from sqlalchemy.orm import contains_eager, joinedload
+
+from models import db, Customer, PopOrder
+from outbox import record_status_changes
+
+ORDER_STATUSES = ('Pending', 'Approved', 'Shipped', 'Rejected')
+
+_fts_available = None
+
+
+def fts_available():
+    global _fts_available
+    if _fts_available is None:
+        _fts_available = inspect(db.engine).has_table('customer_fts')
+    return _fts_available
+
+
+def create_customer_fts():
+    """Create the ``customer_fts`` table and triggers from migration 7e2b5c9a1f03.
+
+    Used when a database is built from the models instead of migrated.
+    Returns False, creating nothing, where SQLite lacks FTS5.
+    """
+    global _fts_available
+    try:
+        db.session.execute(text('CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)'))
+        db.session.execute(text('DROP TABLE temp.fts5_probe'))
+    except Exception:
+        db.session.rollback()
+        return False
+    db.session.execute(text(
+        "CREATE VIRTUAL TABLE customer_fts USING fts5("
+        "store_name, po_number, rep, content='customer', content_rowid='id')"
+    ))
+    db.session.execute(text("INSERT INTO customer_fts (customer_fts) VALUES ('rebuild')"))
+    for event, body in (
+        ('INSERT', "INSERT INTO customer_fts (rowid, store_name, po_number, rep) "
+                   "VALUES (new.id, new.store_name, new.po_number, new.rep);"),
+        ('DELETE', "INSERT INTO customer_fts (customer_fts, rowid, store_name, po_number, rep) "
+                   "VALUES ('delete', old.id, old.store_name, old.po_number, old.rep);"),
+        ('UPDATE', "INSERT INTO customer_fts (customer_fts, rowid, store_name, po_number, rep) "
+                   "VALUES ('delete', old.id, old.store_name, old.po_number, old.rep); "
+                   "INSERT INTO customer_fts (rowid, store_name, po_number, rep) "
+                   "VALUES (new.id, new.store_name, new.po_number, new.rep);"),
+    ):
+        suffix = {'INSERT': 'ai', 'DELETE': 'ad', 'UPDATE': 'au'}[event]
+        db.session.execute(text(
+            f"CREATE TRIGGER customer_fts_{suffix} AFTER {event} ON customer BEGIN {body} END"
+        ))
+    db.session.commit()
+    _fts_available = True
+    return True
+
+
+def encode_cursor(order):
+    return f"{order.timestamp.isoformat()}_{order.id}"
+
+
+def decode_cursor(cursor):
+    """Return ``(timestamp, id)`` for a cursor string, or None if malformed."""
+    try:
+        stamp, _, order_id = cursor.rpartition('_')
+        return datetime.fromisoformat(stamp), int(order_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+# FTS5's unicode61 tokenizer: runs of letters and digits, case-folded,
+# diacritics removed.
+_TOKEN = re.compile(r'[^\W_]+')
+
+
+def _tokens(value):
+    folded = unicodedata.normalize('NFKD', (value or '').casefold())
+    return _TOKEN.findall(''.join(c for c in folded if not unicodedata.combining(c)))
+
+
+def matching_customer_ids(search):
+    """Ids of customers with a word starting with each token of ``search``.
+
+    Returns None when ``search`` has no tokens, i.e. nothing to filter on.
+    """
+    tokens = _tokens(search)
+    if not tokens:
+        return None
+    if fts_available():
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        return [customer_id for (customer_id,) in db.session.execute(
+            text('SELECT rowid FROM customer_fts WHERE customer_fts MATCH :q'), {'q': match}
+        )]
+    ids = []
+    for customer_id, *fields in db.session.execute(
+        select(Customer.id, Customer.store_name, Customer.po_number, Customer.rep)
+    ):
+        words = [word for field in fields for word in _tokens(field)]
+        if all(any(word.startswith(token) for word in words) for token in tokens):
+            ids.append(customer_id)
+    return ids
+
+
+def customer_filter(customer_ids, column=PopOrder.customer_id):
+    # Inlined rather than bound, so a broad match can't exceed SQLite's
+    # limit on bound parameters.
+    return column.in_(bindparam('customer_ids', customer_ids, expanding=True, literal_execute=True))
+
+
+def order_filters(search=None, status=None, start=None, end=None):
+    """Criteria shared by the admin table, the CSV export and bulk updates.
+
+    ``start``/``end`` are dates; ``end`` is inclusive.
+    """
+    criteria = []
+    if search:
+        customer_ids = matching_customer_ids(search)
+        if customer_ids is not None:
+            criteria.append(customer_filter(customer_ids))
+    if status:
+        criteria.append(PopOrder.status == status)
+    if start:
+        criteria.append(PopOrder.timestamp >= datetime.combine(start, datetime.min.time()))
+    if end:
+        criteria.append(PopOrder.timestamp < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+    return criteria
+
+
+def _with_joins(query):
+    return query.outerjoin(PopOrder.customer).options(contains_eager(PopOrder.customer), joinedload(PopOrder.item))
+
+
+def _before(position):
+    stamp, order_id = position
+    return or_(
+        PopOrder.timestamp < stamp,
+        and_(PopOrder.timestamp == stamp, PopOrder.id < order_id),
+    )
+
+
+# Up to this many matching customers, a search page is one index seek per
+# customer; beyond it, walking the timestamp index finds a page sooner.
+SEEK_CUSTOMERS = 20
+
+
+def _newest_for_customers(customer_ids, status, position, limit):
+    """Ids of the ``limit`` newest matching orders, merged from per-customer seeks."""
+    streams = []
+    for customer_id in customer_ids:
+        query = select(PopOrder.timestamp, PopOrder.id).where(PopOrder.customer_id == customer_id)
+        if status:
+            query = query.where(PopOrder.status == status)
+        if position:
+            query = query.where(_before(position))
+        streams.append(db.session.execute(
+            query.order_by(PopOrder.timestamp.desc(), PopOrder.id.desc()).limit(limit)
+        ).all())
+    newest = heapq.merge(*streams, key=tuple, reverse=True)
+    return [order_id for _, order_id in list(newest)[:limit]]
+
+
+def orders_page(search=None, status=None, cursor=None, limit=50):
+    """Return ``(orders, next_cursor)`` for one page of the admin table."""
+    position = decode_cursor(cursor) if cursor else None
+    customer_ids = matching_customer_ids(search) if search else None
+    if customer_ids is not None and len(customer_ids) <= SEEK_CUSTOMERS:
+        order_ids = _newest_for_customers(customer_ids, status, position, limit + 1)
+        orders = _with_joins(PopOrder.query).filter(PopOrder.id.in_(order_ids)).all()
+        orders.sort(key=lambda order: (order.timestamp, order.id), reverse=True)
+    else:
+        query = _with_joins(PopOrder.query)
+        if status:
+            query = query.filter(PopOrder.status == status)
+        if customer_ids is not None:
+            # Left to itself SQLite probes ix_pop_order_customer_id and sorts
+            # every match; "+ 0" keeps it on the index that is already in
+            # page order, which stops after ``limit`` rows.
+            query = query.filter(customer_filter(customer_ids, PopOrder.customer_id + 0))
+        if position:
+            query = query.filter(_before(position))
+        orders = query.order_by(PopOrder.timestamp.desc(), PopOrder.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_cursor(orders[limit - 1]) if len(orders) > limit else None
+    return orders[:limit], next_cursor
+
+
+BULK_CHUNK_IDS = 500
+
+
+def _update_returning(new_status, old_status, criterion):
+    result = db.session.execute(
+        update(PopOrder)
+        .where(criterion, PopOrder.status == old_status)
+        .values(status=new_status)
+        .returning(PopOrder.id)
+        .execution_options(synchronize_session=False)
+    )
+    return [order_id for (order_id,) in result]
+
+
+def bulk_update_status(new_status, expected=None, search=None, status=None, start=None, end=None):
+    """Move orders to ``new_status`` in one transaction and summarise the result.
+
+    ``expected`` maps order id -> the status the caller last saw (``None``
+    meaning "any"); without it the orders matching the admin filters are
+    targeted instead, and ``status`` doubles as the expected status.
+    Returns a summary dict with counts by previous status and, for explicit
+    ids, which ones were skipped or missing.
+    """
+    changes = {}
+    if expected is not None:
+        groups = defaultdict(list)
+        for order_id, seen in expected.items():
+            groups[seen].append(order_id)
+        for seen, ids in groups.items():
+            olds = [seen] if seen else [s for s in ORDER_STATUSES if s != new_status]
+            for old in olds:
+                if old == new_status:
+                    continue
+                for i in range(0, len(ids), BULK_CHUNK_IDS):
+                    for order_id in _update_returning(new_status, old, PopOrder.id.in_(ids[i:i + BULK_CHUNK_IDS])):
+                        changes[order_id] = old
+    else:
+        matching = select(PopOrder.id).where(*order_filters(search, status, start, end))
+        olds = [status] if status else ORDER_STATUSES
+        for old in olds:
+            if old != new_status:
+                for order_id in _update_returning(new_status, old, PopOrder.id.in_(matching)):
+                    changes[order_id] = old
+
+    notifications = record_status_changes(db.session, changes, new_status) if changes else 0
+    summary = {
+        'status': new_status,
+        'updated': len(changes),
+        'previous': dict(Counter(changes.values())),
+        'notifications': notifications,
+    }
+    if expected is not None:
+        untouched = [order_id for order_id in expected if order_id not in changes]
+        current = {}
+        for i in range(0, len(untouched), BULK_CHUNK_IDS):
+            current.update(db.session.execute(
+                select(PopOrder.id, PopOrder.status)
+                .where(PopOrder.id.in_(untouched[i:i + BULK_CHUNK_IDS]))
+            ).all())
+        summary['unchanged'] = sum(1 for s in current.values() if s == new_status)
+        summary['skipped'] = [
+            {'id': order_id, 'status': s, 'expected': expected[order_id]}
+            for order_id, s in current.items() if s != new_status
+        ]
+        summary['missing'] = [order_id for order_id in untouched if order_id not in current]
+    db.session.commit()
+    return summary
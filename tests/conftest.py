@@ -0,0 +1,44 @@
+import pytest
+
+from app import create_app
+from ingest import pipeline
+from models import db, Customer, PopItem, User
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SECRET_KEY': 'test',
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'crm.db'}",
+        'INGEST_QUEUE_PATH': str(tmp_path / 'queue.db'),
+        'IMPORT_REPORT_DIR': str(tmp_path / 'imports'),
+        'METRICS_ENABLED': False,
+        'DASHBOARD_CACHE_TTL': 0,
+    })
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+    pipeline.queue.close()
+
+
+@pytest.fixture
+def admin_client(app):
+    admin = User(username='admin', role='admin')
+    admin.set_password('secret')
+    db.session.add(admin)
+    db.session.commit()
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'secret'})
+    return client
+
+
+@pytest.fixture
+def catalog(app):
+    """One P.O.P. item and one customer to hang orders off."""
+    item = PopItem(id=1, name='Window banner')
+    customer = Customer(po_number='PO-100', store_name='Corner Store', email='store@example.com', rep='Polina')
+    db.session.add_all([item, customer])
+    db.session.commit()
+    return item, customer
@@ -0,0 +1,75 @@
+import threading
+import time
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+import auth
+from auth import LoginThrottle, PasswordCheckBusy, PasswordChecker
+from models import db, User
+
+
+def test_throttle_blocks_a_username_after_its_limit():
+    throttle = LoginThrottle(window=60, max_per_ip=10, max_per_user=2)
+    throttle.failed('10.0.0.1', 'Admin')
+    assert throttle.retry_after('10.0.0.1', 'admin') == 0
+
+    throttle.failed('10.0.0.2', 'admin')
+
+    assert 0 < throttle.retry_after('10.0.0.3', 'ADMIN') <= 61
+    assert throttle.retry_after('10.0.0.3', 'someone') == 0
+    throttle.succeeded('admin')
+    assert throttle.retry_after('10.0.0.3', 'admin') == 0
+
+
+def test_throttle_blocks_an_ip_and_forgets_after_the_window():
+    throttle = LoginThrottle(window=0.2, max_per_ip=3, max_per_user=10)
+    for n in range(3):
+        throttle.failed('10.0.0.1', f'user{n}')
+
+    assert throttle.retry_after('10.0.0.1', 'fresh') > 0
+    time.sleep(0.25)
+    assert throttle.retry_after('10.0.0.1', 'fresh') == 0
+
+
+def test_throttle_caps_tracked_keys():
+    throttle = LoginThrottle(max_keys=10)
+    for n in range(50):
+        throttle.failed('10.0.0.1', f'spray{n}')
+
+    assert len(throttle._failures) == 10
+
+
+def test_password_checker_verifies_and_refuses_when_saturated(monkeypatch):
+    checker = PasswordChecker(workers=1, queue=0)
+    try:
+        password_hash = generate_password_hash('secret')
+        assert checker.verify(password_hash, 'secret')
+        assert not checker.verify(password_hash, 'wrong')
+        assert not checker.verify(None, 'secret')
+
+        release = threading.Event()
+        monkeypatch.setattr(auth, 'check_password_hash', lambda *args: release.wait(5))
+        waiter = threading.Thread(target=checker.verify, args=(password_hash, 'secret'))
+        waiter.start()
+        time.sleep(0.05)
+        with pytest.raises(PasswordCheckBusy):
+            checker.verify(password_hash, 'secret')
+        release.set()
+        waiter.join()
+        assert checker.verify(password_hash, 'secret')
+    finally:
+        checker.shutdown()
+
+
+def test_user_cache_is_dropped_when_a_user_commit_lands(app):
+    user = User(username='rep', role='rep')
+    db.session.add(user)
+    db.session.commit()
+    auth.user_cache.invalidate()
+    auth.user_cache.ttl = 60
+    assert auth.user_cache.get(user.id).role == 'rep'
+
+    user.role = 'admin'
+    db.session.commit()
+    assert auth.user_cache.get(user.id).role == 'admin'
@@ -0,0 +1,38 @@
+import sqlite3
+import threading
+import time
+
+from backup import online_copy
+
+
+def test_online_copy_finishes_under_steady_writes(tmp_path):
+    source_path = str(tmp_path / 'source.db')
+    conn = sqlite3.connect(source_path)
+    conn.execute('CREATE TABLE t (x)')
+    conn.executemany('INSERT INTO t VALUES (?)', [('x' * 500,)] * 2000)
+    conn.commit()
+    conn.close()
+
+    stop = threading.Event()
+
+    def write():
+        writer = sqlite3.connect(source_path)
+        while not stop.is_set():
+            writer.execute('INSERT INTO t VALUES (1)')
+            writer.commit()
+            time.sleep(0.002)
+        writer.close()
+
+    thread = threading.Thread(target=write)
+    thread.start()
+    try:
+        pages = online_copy(source_path, str(tmp_path / 'copy.db'), pages=4, pause=0.005, max_restarts=1)
+    finally:
+        stop.set()
+        thread.join()
+
+    copy = sqlite3.connect(str(tmp_path / 'copy.db'))
+    assert copy.execute('PRAGMA integrity_check').fetchone() == ('ok',)
+    assert copy.execute('SELECT COUNT(*) FROM t').fetchone()[0] >= 2000
+    assert pages > 0
+    copy.close()
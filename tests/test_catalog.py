@@ -0,0 +1,28 @@
+from models import db
+
+
+def test_catalog_answers_repeat_visits_with_304(app, catalog):
+    client = app.test_client()
+    first = client.get('/pop_items')
+    assert first.status_code == 200
+    assert b'Window banner' in first.data
+    etag = first.headers['ETag']
+
+    assert client.get('/pop_items', headers={'If-None-Match': etag}).status_code == 304
+    modified = client.get('/pop_items', headers={'If-Modified-Since': first.headers['Last-Modified']})
+    assert modified.status_code == 304
+    assert client.get('/pop_items', headers={'If-None-Match': '"other"'}).status_code == 200
+
+
+def test_item_commit_changes_the_etag_at_once(app, catalog):
+    item, _ = catalog
+    client = app.test_client()
+    etag = client.get('/pop_items').headers['ETag']
+
+    item.name = 'Door banner'
+    db.session.commit()
+    response = client.get('/pop_items', headers={'If-None-Match': etag})
+
+    assert response.status_code == 200
+    assert b'Door banner' in response.data
+    assert response.headers['ETag'] != etag
@@ -0,0 +1,57 @@
+import io
+
+import pytest
+
+from contact_import import RowError, import_contacts, normalise_email, normalise_phone
+from metrics import dashboard_metrics
+from models import db, Contact
+
+
+def run_import(app, text, fmt='csv', chunk_rows=2):
+    return import_contacts(io.BytesIO(text.encode('utf-8')), fmt, app.config['IMPORT_REPORT_DIR'],
+                           chunk_rows=chunk_rows)
+
+
+def test_normalise_email_and_phone():
+    assert normalise_email('  Ana@Example.COM ') == 'ana@example.com'
+    assert normalise_email('') is None
+    with pytest.raises(RowError):
+        normalise_email('not-an-email')
+
+    assert normalise_phone('(415) 555-0100') == '+14155550100'
+    assert normalise_phone('+44 20 7946 0958') == '+442079460958'
+    assert normalise_phone(' ') is None
+    with pytest.raises(RowError):
+        normalise_phone('12-34')
+
+
+def test_import_upserts_on_normalised_email(app):
+    db.session.add(Contact(name='Ana', email='Ana@Example.com', phone='+15550001111', rep='Polina'))
+    db.session.commit()
+
+    report = run_import(app, (
+        'Full Name,E-mail,Mobile,Sales Rep\n'
+        ',ANA@example.com,,Ravi\n'          # existing contact, blank cells keep old values
+        'Bo,bo@example.com,415 555 0100,Ravi\n'
+        'Bo Lee,BO@example.com,,\n'         # next chunk: updates the contact inserted above
+        'Cy,broken,,\n'
+        'Di,,,Polina\n'
+    ))
+
+    assert dict(report.counts) == {'rows': 5, 'errors': 1, 'inserted': 2, 'updated': 2}
+    contacts = {c.name: c for c in Contact.query}
+    assert sorted(contacts) == ['Ana', 'Bo Lee', 'Di']
+    assert (contacts['Ana'].phone, contacts['Ana'].rep) == ('+15550001111', 'Ravi')
+    assert (contacts['Bo Lee'].email, contacts['Bo Lee'].phone, contacts['Bo Lee'].rep) == \
+        ('bo@example.com', '+14155550100', 'Ravi')
+    with open(report.path) as f:
+        assert 'invalid email' in f.read()
+    reps = {row['rep']: row['total_contacts'] for row in dashboard_metrics(0)[1]}
+    assert reps.get('Ravi') == 2 and reps.get('Polina') == 1
+
+
+def test_import_jsonl_reports_bad_lines(app):
+    report = run_import(app, '{"name": "Ana", "email": "ana@example.com"}\nnot json\n[1]\n', fmt='jsonl')
+
+    assert report.counts['inserted'] == 1
+    assert report.counts['errors'] == 2
@@ -0,0 +1,61 @@
+import csv
+import gzip
+import io
+from datetime import date, datetime
+
+from exports import CONTACT_COLUMNS, contact_export_query, csv_chunks, gzip_chunks
+from models import db, Contact, Customer, PopOrder
+
+
+def rows(data):
+    return list(csv.reader(io.StringIO(data.decode('utf-8'))))
+
+
+def test_order_export_applies_filters(admin_client, catalog):
+    _, corner = catalog
+    harbor = Customer(po_number='PO-200', store_name='Harbor Books', rep='Ravi')
+    db.session.add(harbor)
+    db.session.flush()
+    db.session.add_all([
+        PopOrder(customer_id=corner.id, item_id=1, quantity=2, status='Pending', timestamp=datetime(2026, 3, 1, 9)),
+        PopOrder(customer_id=corner.id, item_id=1, quantity=3, status='Shipped', timestamp=datetime(2026, 3, 2, 9)),
+        PopOrder(customer_id=harbor.id, item_id=1, quantity=4, status='Pending', timestamp=datetime(2026, 3, 1, 9)),
+    ])
+    db.session.commit()
+
+    response = admin_client.get('/admin/pop_orders/export?search=corner&status=Pending')
+    assert response.mimetype == 'text/csv'
+    header, *body = rows(response.data)
+    assert header[:3] == ['Order ID', 'Submitted', 'Status']
+    assert [(row[3], row[8]) for row in body] == [('Corner Store', '2')]
+
+    response = admin_client.get('/admin/pop_orders/export?start=2026-03-02&end=2026-03-02')
+    assert [row[3] for row in rows(response.data)[1:]] == ['Corner Store']
+
+
+def test_contact_export_filters_archived_and_gzips(admin_client):
+    db.session.add_all([
+        Contact(name='Ana', email='ana@example.com', created_at=datetime(2026, 3, 1)),
+        Contact(name='Bo', archived=True, created_at=datetime(2026, 3, 1)),
+    ])
+    db.session.commit()
+
+    response = admin_client.get('/export?status=active&gzip=1')
+
+    assert response.mimetype == 'application/gzip'
+    assert response.headers['Content-Disposition'].endswith(f'contacts_{date.today().isoformat()}.csv.gz')
+    assert [row[1] for row in rows(gzip.decompress(response.data))[1:]] == ['Ana']
+    archived = admin_client.get('/export?status=archived')
+    assert [row[1] for row in rows(archived.data)[1:]] == ['Bo']
+
+
+def test_streamed_chunks_gzip_to_the_plain_csv(app):
+    db.session.add_all([Contact(name=f'Contact {n}') for n in range(5)])
+    db.session.commit()
+    header = [label for label, _ in CONTACT_COLUMNS]
+
+    plain = b''.join(csv_chunks(header, contact_export_query(), chunk_rows=2))
+    compressed = b''.join(gzip_chunks(csv_chunks(header, contact_export_query(), chunk_rows=2)))
+
+    assert gzip.decompress(compressed) == plain
+    assert len(rows(plain)) == 6
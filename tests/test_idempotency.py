@@ -0,0 +1,37 @@
+from models import PopOrder
+from ingest import pipeline
+
+
+def order(po_number, quantity=1):
+    return {
+        'store_name': 'Corner Store',
+        'po_number': po_number,
+        'email': 'store@example.com',
+        'items': [{'item_id': 1, 'quantity': quantity}],
+    }
+
+
+def test_retry_with_idempotency_key_is_replayed(app, catalog):
+    client = app.test_client()
+    headers = {'Idempotency-Key': 'wix-123'}
+    first = client.post('/api/pop_order', json=order('PO-1'), headers=headers)
+    retry = client.post('/api/pop_order', json=order('PO-1'), headers=headers)
+
+    assert first.status_code == retry.status_code == 202
+    assert 'Idempotent-Replayed' not in first.headers
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert retry.json == first.json
+    assert pipeline.stats()['queue_depth'] == 1
+
+
+def test_retry_without_key_is_replayed_after_flush(app, catalog):
+    client = app.test_client()
+    client.post('/api/pop_order', json=order('PO-1', quantity=3))
+    assert pipeline.flush() == 1
+
+    # A fresh in-memory cache still finds the key in the queue file.
+    pipeline.recent._entries.clear()
+    retry = client.post('/api/pop_order', json=order('PO-1', quantity=3))
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert pipeline.stats()['queue_depth'] == 0
+    assert PopOrder.query.count() == 1
@@ -0,0 +1,127 @@
+import json
+import sqlite3
+
+import pytest
+
+from models import db, IngestCheckpoint, IngestDeadLetter, PopOrder
+from ingest import OrderQueue, pipeline, validate_order
+
+
+def order(po_number, quantity=1):
+    return {
+        'store_name': 'Corner Store',
+        'po_number': po_number,
+        'email': 'store@example.com',
+        'items': [{'item_id': 1, 'quantity': quantity}],
+    }
+
+
+def submit(po_number):
+    """Queue an order and return its queue sequence."""
+    pipeline.submit(validate_order(order(po_number)))
+    return pipeline.queue.peek(1000)[-1][0]
+
+
+def checkpoint():
+    return db.session.get(IngestCheckpoint, pipeline.queue.checkpoint_name).last_seq
+
+
+def test_flush_advances_checkpoint_and_trims_queue(app, catalog):
+    seqs = [submit(f'PO-{n}') for n in range(3)]
+
+    assert pipeline.flush() == 3
+    assert checkpoint() == max(seqs)
+    assert pipeline.stats()['queue_depth'] == 0
+    assert PopOrder.query.count() == 3
+
+
+def test_entries_at_or_below_checkpoint_are_not_reapplied(app, catalog):
+    # As if the process died after committing the first order but before trimming the queue.
+    first = submit('PO-1')
+    submit('PO-2')
+    db.session.add(IngestCheckpoint(name=pipeline.queue.checkpoint_name, last_seq=first))
+    db.session.commit()
+
+    assert pipeline.flush() == 1
+    assert [o.customer_id for o in PopOrder.query] == [2]
+    assert pipeline.stats()['queue_depth'] == 0
+
+
+def test_batch_claimed_by_another_flusher_is_not_applied(app, catalog, monkeypatch):
+    submit('PO-1')
+    last = submit('PO-2')
+    entries = pipeline.queue.peek(10)
+    # Another worker applied both entries after this flusher read the checkpoint.
+    db.session.add(IngestCheckpoint(name=pipeline.queue.checkpoint_name, last_seq=last))
+    db.session.commit()
+    monkeypatch.setattr(pipeline, '_checkpoint', lambda: 0)
+
+    assert pipeline._apply(entries) == (None, 0, 0)
+    assert PopOrder.query.count() == 0
+    assert checkpoint() == last
+
+
+def test_validate_order_rejects_values_the_tables_cannot_hold():
+    too_big = order('PO-1')
+    too_big['items'][0]['item_id'] = 10 ** 20
+    long_name = order('PO-1')
+    long_name['store_name'] = 'x' * 101
+    huge_quantity = order('PO-1', quantity=10 ** 9)
+
+    for payload in (too_big, long_name, huge_quantity):
+        with pytest.raises(ValueError):
+            validate_order(payload)
+
+
+def test_order_that_cannot_be_applied_is_dead_lettered(app, catalog):
+    submit('PO-1')
+    # Queued before validation was tightened; SQLite rejects the item id outright.
+    poison = validate_order(order('PO-2'))
+    poison['items'][0]['item_id'] = 10 ** 20
+    pipeline.submit(poison)
+    last = submit('PO-3')
+
+    assert pipeline.flush() == 2
+    assert checkpoint() == last
+    assert pipeline.stats()['queue_depth'] == 0
+    assert PopOrder.query.count() == 2
+    dead = IngestDeadLetter.query.one()
+    assert json.loads(dead.payload)['po_number'] == 'PO-2'
+    assert 'OverflowError' in dead.error
+
+
+def test_order_id_is_a_receipt_not_the_queue_sequence(app, catalog):
+    response, replayed = pipeline.submit(validate_order(order('PO-1')))
+
+    assert not replayed
+    assert pipeline.submit(validate_order(order('PO-1'))) == (response, True)
+    assert pipeline.queue.peek(1)[0][1]['receipt'] == response['order_id']
+    assert response['order_id'] != 1
+
+
+def test_recreated_queue_file_gets_its_own_checkpoint(app, catalog, tmp_path):
+    submit('PO-1')
+    assert pipeline.flush() == 1
+    old_name = pipeline.queue.checkpoint_name
+
+    # The queue file is lost; sequences restart at 1 in the new one.
+    pipeline.queue.close()
+    pipeline.queue = OrderQueue(str(tmp_path / 'recreated.db'))
+    submit('PO-2')
+
+    assert pipeline.queue.checkpoint_name != old_name
+    assert pipeline.flush() == 1
+    assert PopOrder.query.count() == 2
+
+
+def test_existing_queue_file_keeps_the_legacy_checkpoint(tmp_path):
+    path = str(tmp_path / 'queue.db')
+    OrderQueue(path).close()
+    assert OrderQueue(path).checkpoint_name != 'pop_order'
+
+    legacy = str(tmp_path / 'legacy.db')
+    conn = sqlite3.connect(legacy)
+    conn.execute('CREATE TABLE queued_order (seq INTEGER PRIMARY KEY AUTOINCREMENT,'
+                 ' payload TEXT NOT NULL, received_at TEXT NOT NULL)')
+    conn.close()
+    assert OrderQueue(legacy).checkpoint_name == 'pop_order'
@@ -0,0 +1,110 @@
+from datetime import datetime, timedelta
+
+import pop_orders
+from models import db, Customer, OutboxMessage, PopOrder
+from pop_orders import bulk_update_status, orders_page
+
+
+def add_orders(customer, statuses):
+    orders = [PopOrder(customer_id=customer.id, item_id=1, quantity=1, status=s) for s in statuses]
+    db.session.add_all(orders)
+    db.session.commit()
+    return [o.id for o in orders]
+
+
+def statuses():
+    return dict(db.session.query(PopOrder.id, PopOrder.status))
+
+
+def test_bulk_update_skips_orders_changed_since_they_were_seen(app, catalog):
+    _, customer = catalog
+    first, second, third = add_orders(customer, ['Pending', 'Pending', 'Pending'])
+    # Someone else shipped the second order after the admin loaded the page.
+    db.session.get(PopOrder, second).status = 'Shipped'
+    db.session.commit()
+    queued = OutboxMessage.query.count()
+
+    summary = bulk_update_status('Approved', expected=dict.fromkeys([first, second, third], 'Pending'))
+
+    assert summary['updated'] == 2
+    assert summary['previous'] == {'Pending': 2}
+    assert summary['skipped'] == [{'id': second, 'status': 'Shipped', 'expected': 'Pending'}]
+    assert summary['missing'] == []
+    assert statuses() == {first: 'Approved', second: 'Shipped', third: 'Approved'}
+    assert OutboxMessage.query.count() - queued == summary['notifications'] == 2
+
+
+def test_bulk_update_reports_missing_and_already_done(app, catalog):
+    _, customer = catalog
+    pending, approved = add_orders(customer, ['Pending', 'Approved'])
+
+    summary = bulk_update_status('Approved', expected={pending: 'Pending', approved: None, 999: None})
+
+    assert summary['updated'] == 1
+    assert summary['unchanged'] == 1
+    assert summary['missing'] == [999]
+
+
+def test_bulk_update_by_filter_only_touches_matching_status(app, catalog):
+    _, customer = catalog
+    ids = add_orders(customer, ['Pending', 'Approved', 'Pending'])
+
+    summary = bulk_update_status('Rejected', status='Pending')
+
+    assert summary['updated'] == 2
+    assert statuses() == {ids[0]: 'Rejected', ids[1]: 'Approved', ids[2]: 'Rejected'}
+
+
+def test_bulk_status_route(admin_client, catalog):
+    _, customer = catalog
+    first, second = add_orders(customer, ['Pending', 'Approved'])
+
+    response = admin_client.post('/api/pop_orders/status', json={
+        'status': 'Shipped',
+        'orders': [{'id': first, 'status': 'Pending'}, {'id': second, 'status': 'Pending'}],
+    })
+
+    assert response.status_code == 200
+    assert response.json['updated'] == 1
+    assert response.json['skipped'] == [{'id': second, 'status': 'Approved', 'expected': 'Pending'}]
+    assert admin_client.post('/api/pop_orders/status', json={'status': 'Lost'}).status_code == 400
+
+
+def search_pages(search, status=None, limit=2):
+    ids, cursor = [], None
+    while True:
+        orders, cursor = orders_page(search, status, cursor=cursor, limit=limit)
+        ids += [o.id for o in orders]
+        if not cursor:
+            return ids
+
+
+def test_search_pages_match_whether_customers_are_seeked_or_walked(app, catalog, monkeypatch):
+    _, corner = catalog
+    other = Customer(po_number='PO-200', store_name='Corner Deli', rep='Ravi')
+    unrelated = Customer(po_number='PO-300', store_name='Harbor Books', rep='Polina')
+    db.session.add_all([other, unrelated])
+    db.session.commit()
+    start = datetime(2026, 1, 1)
+    for n, customer in enumerate([corner, other, unrelated] * 3):
+        db.session.add(PopOrder(customer_id=customer.id, item_id=1, quantity=1, timestamp=start + timedelta(hours=n)))
+    # Two orders with the same timestamp exercise the id tie-break.
+    db.session.add(PopOrder(customer_id=other.id, item_id=1, quantity=1, timestamp=start))
+    db.session.commit()
+    expected = [o.id for o in PopOrder.query.filter(PopOrder.customer_id != unrelated.id)
+                .order_by(PopOrder.timestamp.desc(), PopOrder.id.desc())]
+
+    assert search_pages('corn') == expected
+    monkeypatch.setattr(pop_orders, 'SEEK_CUSTOMERS', 0)
+    assert search_pages('corn') == expected
+
+
+def test_search_without_fts_matches_word_prefixes(app, catalog, monkeypatch):
+    db.session.add(Customer(po_number='PO-200', store_name='Scorned Deli', rep='Ravi'))
+    db.session.commit()
+    searches = ['corn', 'CORNER st', 'po 100', '100', 'orner', 'pol', 'deli corn']
+    with_fts = {search: pop_orders.matching_customer_ids(search) for search in searches}
+    monkeypatch.setattr(pop_orders, '_fts_available', False)
+
+    assert {search: pop_orders.matching_customer_ids(search) for search in searches} == with_fts
+    assert with_fts['orner'] == []
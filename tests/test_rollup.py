@@ -0,0 +1,70 @@
+from datetime import date, timedelta
+
+from sqlalchemy import func, select
+
+from metrics import rebuild
+from models import db, Contact, DashboardRollup, Task
+
+
+def snapshot():
+    r = DashboardRollup
+    rows = db.session.execute(
+        select(r.rep, r.day, func.sum(r.contacts), func.sum(r.pending), func.sum(r.completed))
+        .group_by(r.rep, r.day)
+    )
+    return {(rep, day): counts for rep, day, *counts in rows if any(counts)}
+
+
+def assert_matches_rebuild():
+    incremental = snapshot()
+    rebuild()
+    assert snapshot() == incremental
+
+
+def test_rollup_tracks_contact_and_task_changes(app):
+    today = date.today()
+    ann = Contact(name='Ann', rep='Polina')
+    bob = Contact(name='Bob', rep='Marco')
+    ann.tasks = [Task(title='Call', due_date=today), Task(title='Visit', due_date=today + timedelta(days=2))]
+    bob.tasks = [Task(title='Email', due_date=today - timedelta(days=1))]
+    db.session.add_all([ann, bob])
+    db.session.commit()
+    assert snapshot()[('Polina', None)] == [1, 0, 0]
+    assert_matches_rebuild()
+
+    call, visit = ann.tasks
+    call.status = 'completed'
+    visit.due_date = today + timedelta(days=5)
+    db.session.commit()
+    assert_matches_rebuild()
+
+    # Moving a contact moves its tasks' counts to the new rep.
+    ann.rep = 'Marco'
+    db.session.commit()
+    assert_matches_rebuild()
+
+    ann.archived = True
+    db.session.commit()
+    assert_matches_rebuild()
+
+    db.session.delete(visit)
+    db.session.commit()
+    assert_matches_rebuild()
+
+    db.session.delete(bob)
+    db.session.commit()
+    assert_matches_rebuild()
+    assert ('Marco', today - timedelta(days=1)) not in snapshot()
+
+
+def test_rolled_back_changes_leave_rollup_alone(app):
+    db.session.add(Contact(name='Ann', rep='Polina'))
+    db.session.commit()
+    before = snapshot()
+
+    db.session.add(Contact(name='Cy', rep='Polina'))
+    db.session.flush()
+    db.session.rollback()
+
+    assert snapshot() == before
+    assert_matches_rebuild()
@@ -0,0 +1,40 @@
+import os
+import shutil
+
+import pytest
+from flask_migrate import upgrade
+
+from app import create_app, start_background
+from ingest import pipeline
+from models import db
+
+SHIPPED_DB = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'instance', 'crm.db')
+
+
+def make_app(tmp_path):
+    return create_app({
+        'TESTING': True,
+        'SECRET_KEY': 'test',
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'crm.db'}",
+        'INGEST_QUEUE_PATH': str(tmp_path / 'queue.db'),
+        'METRICS_ENABLED': False,
+    })
+
+
+@pytest.mark.skipif(not os.path.exists(SHIPPED_DB), reason='no shipped crm.db')
+def test_shipped_database_upgrades_to_head(tmp_path):
+    shutil.copy(SHIPPED_DB, tmp_path / 'crm.db')
+    app = make_app(tmp_path)
+    try:
+        assert not app.extensions['schema_current']
+        with pytest.raises(RuntimeError):
+            start_background(app)
+        with app.app_context():
+            upgrade()
+            db.engine.dispose()
+    finally:
+        pipeline.queue.close()
+
+    app = make_app(tmp_path)
+    pipeline.queue.close()
+    assert app.extensions['schema_current']
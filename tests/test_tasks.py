@@ -0,0 +1,21 @@
+from datetime import date, timedelta
+
+from models import db, Contact, Task
+
+
+def test_task_bucket_limit_is_clamped(admin_client):
+    contact = Contact(name='Corner Store', rep='Polina')
+    overdue = date.today() - timedelta(days=1)
+    contact.tasks = [Task(title=f'Call {n}', due_date=overdue) for n in range(3)]
+    db.session.add(contact)
+    db.session.commit()
+
+    def count(limit):
+        response = admin_client.get(f'/api/tasks?bucket=overdue&limit={limit}')
+        assert response.status_code == 200
+        return len(response.get_json())
+
+    assert count(-1) == 1
+    assert count(0) == 1
+    assert count(2) == 2
+    assert count(1000) == 3